@@ -0,0 +1,65 @@
+import os
+import shutil
+from datetime import datetime
+
+# Versioned directories published by swapping a pointer file, shared by the
+# recommendation store (rec_store.py) and the model host (model_host.py):
+#
+#   <root>/CURRENT               name of the live version, swapped with os.replace
+#   <root>/versions/<version>/   files of one version, never modified once published
+#
+# Readers resolve CURRENT and then only read inside that version's directory,
+# so they see either the old or the new version, never a mix.
+KEEP_VERSIONS = 2
+
+
+def new_version(root):
+    # A fresh, empty version directory to write into before publishing it
+    version = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    version_dir = os.path.join(root, 'versions', version)
+    os.makedirs(version_dir)
+    return version, version_dir
+
+
+def _fsync_path(path):
+    # Directories are opened read-only; fsync on them persists their entries
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_version(version_dir):
+    # Flush every file of a version and the directory entries that name them
+    for name in os.listdir(version_dir):
+        _fsync_path(os.path.join(version_dir, name))
+    _fsync_path(version_dir)
+    _fsync_path(os.path.dirname(version_dir))
+
+
+def publish(version, root, keep_versions=KEEP_VERSIONS):
+    # The version's files are made durable before CURRENT names it, so a crash
+    # can't leave CURRENT pointing at files that were never written out
+    sync_version(os.path.join(root, 'versions', version))
+    tmp_path = os.path.join(root, 'CURRENT.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, 'CURRENT'))
+    _fsync_path(root)
+
+    # Old versions can go; readers that still map them keep their pages until they refresh
+    versions = sorted(os.listdir(os.path.join(root, 'versions')))
+    for old in versions[:-keep_versions]:
+        if old != version:
+            shutil.rmtree(os.path.join(root, 'versions', old), ignore_errors=True)
+
+
+def current_version(root):
+    try:
+        with open(os.path.join(root, 'CURRENT')) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
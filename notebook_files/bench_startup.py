@@ -0,0 +1,154 @@
+import os
+import sys
+import ast
+import csv
+import time
+import subprocess
+from datetime import datetime
+
+# Cold-start latency of the pipeline entry modules. Each module is imported in a
+# fresh interpreter with `-X importtime`; we record the wall time of the whole
+# process and the import time reported for the module itself, and append both
+# to a CSV so regressions show up over time.
+#
+# The entry modules defer their heavy imports into the functions that run the
+# step, so `import <module>` alone is cheap by construction. Each module is also
+# timed together with every import the step can reach, which is the start-up
+# cost a pipeline run actually pays before doing any work. That list is read
+# from the source (see step_imports) so it can't drift from the code.
+MODULES = ['data_prep', 'train_model', 'evaluate_model', 'generate_recommendations']
+# Unpickling models/movie_recommender.pkl imports the sklearn classes that
+# modeling.build_pipeline uses, so steps that can load the model pay for these too
+PICKLED_MODEL_LOADERS = ['model_host']
+PICKLED_MODEL_MODULES = ['modeling']
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'startup_times.csv')
+
+
+def parse_importtime(stderr):
+    # Lines look like: "import time:       self [us] |  cumulative | imported package"
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        imports.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return imports
+
+
+def _imported_names(path):
+    # Every absolute import in a file, including the ones inside functions
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            yield node.module
+
+
+def step_imports(module, here=None):
+    # Local modules the step reaches, followed transitively, then the
+    # third-party and stdlib modules any of them import
+    here = here or os.path.dirname(os.path.abspath(__file__))
+    local, external = [], []
+    pending = [module]
+    while pending:
+        name = pending.pop()
+        if name in local:
+            continue
+        local.append(name)
+        if name in PICKLED_MODEL_LOADERS:
+            pending.extend(PICKLED_MODEL_MODULES)
+        for imported in _imported_names(os.path.join(here, f'{name}.py')):
+            top_level = imported.split('.')[0]
+            if os.path.exists(os.path.join(here, f'{top_level}.py')):
+                pending.append(top_level)
+            elif imported not in external:
+                external.append(imported)
+    return local[1:] + sorted(external)
+
+
+def step_statement(module):
+    return '; '.join(f'import {name}' for name in [module] + step_imports(module))
+
+
+def measure(module, statement=None, repeats=5, allow_failure=False):
+    # Best of `repeats` runs, since the first run also pays for a cold page cache.
+    # With allow_failure, a statement that can't run here (a dependency isn't
+    # installed) returns None instead of raising.
+    statement = statement or f'import {module}'
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=here + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                                capture_output=True, text=True, env=env, cwd=here)
+        wall_ms = (time.perf_counter() - started) * 1000
+        if result.returncode != 0:
+            if allow_failure:
+                print(f"    skipped importing {module}'s step modules: {result.stderr.strip().splitlines()[-1:]}")
+                return None
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+        imports = parse_importtime(result.stderr)
+        module_us = next((cumulative for name, _, cumulative in imports if name == module), 0)
+        if best is None or wall_ms < best['wall_ms']:
+            best = {'wall_ms': wall_ms, 'module_import_ms': module_us / 1000, 'imports': imports}
+    return best
+
+
+def main():
+    repeats = int(os.environ.get('BENCH_REPEATS', '5'))
+    baseline = measure('sys', 'pass', repeats)
+    print(f"Bare interpreter startup: {baseline['wall_ms']:.1f} ms")
+
+    rows = []
+    run_at = datetime.now().isoformat(timespec='seconds')
+    for module in MODULES:
+        result = measure(module, repeats=repeats)
+        print(f"{module:28s} wall {result['wall_ms']:8.1f} ms   "
+              f"import {result['module_import_ms']:8.1f} ms   "
+              f"over bare {result['wall_ms'] - baseline['wall_ms']:8.1f} ms")
+        # The slowest top-level imports pulled in by this module
+        slowest = sorted(result['imports'], key=lambda item: item[2], reverse=True)
+        slowest = [item for item in slowest if '.' not in item[0] and item[0] != module]
+        for name, _, cumulative in slowest[:3]:
+            print(f"    {name:24s} {cumulative / 1000:8.1f} ms")
+
+        step = measure(module, step_statement(module), repeats, allow_failure=True)
+        if step is not None:
+            print(f"{'  with step imports':28s} wall {step['wall_ms']:8.1f} ms   "
+                  f"over bare {step['wall_ms'] - baseline['wall_ms']:8.1f} ms")
+        rows.append({
+            'run_at': run_at,
+            'python': sys.version.split()[0],
+            'module': module,
+            'wall_ms': round(result['wall_ms'], 2),
+            'module_import_ms': round(result['module_import_ms'], 2),
+            'baseline_ms': round(baseline['wall_ms'], 2),
+            'step_wall_ms': round(step['wall_ms'], 2) if step is not None else float('nan'),
+        })
+
+    os.makedirs(os.path.dirname(HISTORY_PATH), exist_ok=True)
+    write_header = not os.path.exists(HISTORY_PATH)
+    if not write_header:
+        # Older histories lack the step column; rewrite them under the current header
+        with open(HISTORY_PATH, newline='') as f:
+            history = list(csv.DictReader(f))
+        if history and list(history[0]) != list(rows[0]):
+            rows = [{name: row.get(name, '') for name in rows[0]} for row in history] + rows
+            write_header = True
+            os.remove(HISTORY_PATH)
+    with open(HISTORY_PATH, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        if write_header:
+            writer.writeheader()
+        writer.writerows(rows)
+    print(f"Appended results to {HISTORY_PATH}")
+
+
+if __name__ == '__main__':
+    main()
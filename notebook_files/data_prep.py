@@ -0,0 +1,230 @@
+import os
+import glob
+
+# Heavy dependencies (pandas, sklearn) are imported inside the functions that
+# use them so that importing this module stays cheap
+
+
+def find_raw_data_path():
+    # Path to the raw parquet files - modify to use absolute or proper relative path
+    if os.path.exists('raw_data'):
+        raw_data_path = 'raw_data/*.parquet'
+    elif os.path.exists('../raw_data'):
+        raw_data_path = '../raw_data/*.parquet'
+    else:
+        # Try using an absolute path based on notebook_files location
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        raw_data_path = os.path.join(base_dir, 'raw_data/*.parquet')
+        print(f"Looking for parquet files at: {raw_data_path}")
+    return raw_data_path
+
+
+def load_raw_data(raw_data_path):
+    import pandas as pd
+
+    # Read and combine all parquet files
+    parquet_files = glob.glob(raw_data_path)
+    print(f"Found {len(parquet_files)} parquet files: {parquet_files}")
+
+    # Create empty dataframe to hold all data
+    all_data = pd.DataFrame()
+
+    # Read and combine all parquet files
+    for file in parquet_files:
+        print(f"Reading file: {file}")
+        df = pd.read_parquet(file)
+        print(f"File {file} contains {len(df)} rows and columns: {df.columns.tolist()}")
+        # Print sample data to debug
+        print(f"Sample data from this file:")
+        print(df.head(2))
+        print(f"Data types: {df.dtypes}")
+        all_data = pd.concat([all_data, df])
+
+    print(f"Total records loaded: {len(all_data)}")
+    print(f"Final data shape: {all_data.shape}")
+    print(f"Data columns: {all_data.columns.tolist()}")
+    return all_data
+
+
+def time_range_from_env():
+    # DATA_START / DATA_END select an explicit [start, end) range; DATA_LAST_DAYS
+    # selects the last N days before the newest window. None means read everything.
+    from datetime import datetime, timedelta
+    from windows import latest_window_end
+
+    start = os.environ.get('DATA_START')
+    end = os.environ.get('DATA_END')
+    last_days = os.environ.get('DATA_LAST_DAYS')
+    if last_days and (start or end):
+        raise ValueError("DATA_LAST_DAYS can't be combined with DATA_START/DATA_END")
+    if last_days:
+        newest = latest_window_end()
+        if newest is None:
+            raise ValueError("DATA_LAST_DAYS needs ratings_<start>_to_<end>.parquet windows in raw_data")
+        # Window bounds are inclusive, so step just past the newest event
+        end = newest + timedelta(seconds=1)
+        start = end - timedelta(days=float(last_days))
+    if start is None and end is None:
+        return None
+    return (datetime.fromisoformat(start) if isinstance(start, str) else start,
+            datetime.fromisoformat(end) if isinstance(end, str) else end)
+
+
+def subset_from_env():
+    # DATA_USERS / DATA_MOVIES: comma-separated raw ids to restrict ingestion to.
+    # None means no restriction.
+    users = os.environ.get('DATA_USERS')
+    movies = os.environ.get('DATA_MOVIES')
+    return ([user_id.strip() for user_id in users.split(',') if user_id.strip()] if users else None,
+            [movie_id.strip() for movie_id in movies.split(',') if movie_id.strip()] if movies else None)
+
+
+def load_time_range(start, end, users=None, movies=None):
+    from windows import read_windows
+
+    print(f"Reading ratings from {start or 'the first window'} to {end or 'the last window'}")
+    if users is not None:
+        print(f"Restricted to {len(users)} users")
+    if movies is not None:
+        print(f"Restricted to {len(movies)} movies")
+    all_data = read_windows(start, end, users=users, movies=movies)
+    print(f"Total records loaded: {len(all_data)}")
+    print(f"Final data shape: {all_data.shape}")
+    print(f"Data columns: {all_data.columns.tolist()}")
+    return all_data
+
+
+def clean_data(all_data):
+    import pandas as pd
+
+    # Basic data cleaning
+    if len(all_data) == 0:
+        raise ValueError("No data was loaded from the parquet files. Please check file paths and contents.")
+
+    # Remove duplicates if any
+    all_data = all_data.drop_duplicates()
+    print(f"Data shape after removing duplicates: {all_data.shape}")
+
+    # ===== ADDITIONAL DEBUG - RAW DATA BEFORE CONVERSION =====
+    print("\n===== RAW DATA BEFORE CONVERSION =====")
+    print("First 3 rows of raw data:")
+    print(all_data.head(3))
+    print("\nRaw data types:")
+    print(all_data.dtypes)
+    print("="*50)
+    # ===== END ADDITIONAL DEBUG =====
+
+    # Check data types before conversion
+    print(f"Data types before conversion: {all_data.dtypes}")
+    print(f"Sample user_id values: {all_data['user_id'].head(5).tolist()}")
+    print(f"Sample movie_id values: {all_data['movie_id'].head(5).tolist()}")
+
+    # Instead of converting to numeric directly, let's extract user and movie IDs differently
+    # For user_id and movie_id, we'll convert them to categorical codes, keeping the
+    # raw id -> code table for steps that read raw ids (trending, the rating stream)
+    from id_codes import encode_and_save, clear_codes
+    for column, kind in [('user_id', 'user'), ('movie_id', 'movie')]:
+        if not pd.api.types.is_numeric_dtype(all_data[column]):
+            all_data[column] = encode_and_save(all_data[column], kind)
+        else:
+            clear_codes(kind)
+
+    # Check for any remaining NaN values
+    print(f"NaN values count: {all_data.isna().sum()}")
+
+    # Extract timestamp features
+    if 'timestamp' in all_data.columns:
+        # First check if timestamp is already a datetime object
+        if not pd.api.types.is_datetime64_dtype(all_data['timestamp']):
+            all_data['timestamp'] = pd.to_datetime(all_data['timestamp'], errors='coerce')
+
+        # Create time-based features
+        all_data['day_of_week'] = all_data['timestamp'].dt.dayofweek
+        all_data['hour_of_day'] = all_data['timestamp'].dt.hour
+
+        # Drop the original timestamp column since it's not useful for ML
+        all_data = all_data.drop('timestamp', axis=1)
+
+    # Make sure rating is numeric
+    if not pd.api.types.is_numeric_dtype(all_data['rating']):
+        all_data['rating'] = pd.to_numeric(all_data['rating'], errors='coerce')
+        # Fill any NaN ratings with the median
+        all_data['rating'] = all_data['rating'].fillna(all_data['rating'].median())
+
+    # ===== ADDITIONAL DEBUG - PROCESSED DATA AFTER CONVERSION =====
+    print("\n===== PROCESSED DATA AFTER CONVERSION =====")
+    print("First 3 rows of processed data:")
+    print(all_data.head(3))
+    print("\nProcessed data types:")
+    print(all_data.dtypes)
+    print("="*50)
+    # ===== END ADDITIONAL DEBUG =====
+    return all_data
+
+
+def split_and_save(all_data):
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    # Extract the target variable
+    target = all_data['rating'].values
+    # Drop the rating column from the features dataframe
+    data = all_data.drop('rating', axis=1)
+
+    print(f"Data shape before split: {data.shape}")
+    print(f"Target shape before split: {target.shape}")
+
+    # Create train and test sets
+    X_train, X_test, y_train, y_test = train_test_split(
+        data, target, test_size=0.2, random_state=42
+    )
+
+    print(f"Training set shape: {X_train.shape}")
+    print(f"Test set shape: {X_test.shape}")
+
+    # Save the processed data
+    print("Saving processed data...")
+    X_train.to_csv('data/X_train.csv', index=False)
+    X_test.to_csv('data/X_test.csv', index=False)
+    pd.DataFrame(y_train, columns=['rating']).to_csv('data/y_train.csv', index=False)
+    pd.DataFrame(y_test, columns=['rating']).to_csv('data/y_test.csv', index=False)
+
+    # ===== ADDITIONAL DEBUG - DATA SAVED TO CSV =====
+    print("\n===== DATA SAVED TO CSV =====")
+    print("First 3 rows of X_train.csv:")
+    print(pd.read_csv('data/X_train.csv').head(3))
+    print("\nFirst 3 rows of X_test.csv:")
+    print(pd.read_csv('data/X_test.csv').head(3))
+    print("\nFirst 3 rows of y_train.csv:")
+    print(pd.read_csv('data/y_train.csv').head(3))
+    print("\nFirst 3 rows of y_test.csv:")
+    print(pd.read_csv('data/y_test.csv').head(3))
+    print("\nFeatures in saved CSV:")
+    print(f"X_train columns: {pd.read_csv('data/X_train.csv').columns.tolist()}")
+    print(f"X_test columns: {pd.read_csv('data/X_test.csv').columns.tolist()}")
+    print("="*50)
+    # ===== END ADDITIONAL DEBUG =====
+
+
+def main():
+    # Create data directory if it doesn't exist
+    os.makedirs('data', exist_ok=True)
+
+    print("Processing movie data from Kafka streams...")
+    print(f"Current working directory: {os.getcwd()}")
+
+    time_range = time_range_from_env()
+    users, movies = subset_from_env()
+    if time_range is None and users is None and movies is None:
+        all_data = load_raw_data(find_raw_data_path())
+    else:
+        start, end = time_range or (None, None)
+        all_data = load_time_range(start, end, users, movies)
+    all_data = clean_data(all_data)
+    split_and_save(all_data)
+
+    print("Data preparation completed successfully!")
+
+
+if __name__ == '__main__':
+    main()
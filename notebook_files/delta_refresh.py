@@ -0,0 +1,110 @@
+import os
+import json
+import hashlib
+
+from windows import list_window_files
+from id_codes import load_codes
+
+# State left by the previous recommendation run, used by RECOMMEND_MODE=delta
+# to rescore only the users whose rating history changed since then
+STATE_PATH = 'recommendations/refresh_state.json'
+MODEL_FILES = ['models/movie_recommender.pkl', 'models/feature_list.pkl']
+
+
+def model_version(paths=MODEL_FILES):
+    # Content hash rather than mtime: every pod gets a fresh copy of the model
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(windows, version, trending_version=None, path=STATE_PATH):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'windows': sorted(windows), 'model_version': version,
+                   'trending_version': trending_version}, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def trending_version(trending_scores, trending_weight):
+    # Identifies the trending blend a run ranked with; None when it is off
+    if trending_weight <= 0 or not trending_scores:
+        return None
+    digest = hashlib.sha256(repr(trending_weight).encode())
+    for movie_id, score in sorted(trending_scores.items()):
+        digest.update(f'{movie_id}:{score:.6f};'.encode())
+    return digest.hexdigest()
+
+
+def current_windows(raw_data_dir=None):
+    return [os.path.basename(path) for path in list_window_files(raw_data_dir)]
+
+
+def find_changed_users(state, raw_data_dir=None):
+    # Users with at least one rating in a window the previous run had not seen,
+    # and those ratings, both on the codes data prep assigned (windows hold raw
+    # ids). Also returns every window name considered, to be recorded once the
+    # refresh has been written.
+    import pandas as pd
+
+    seen = set(state['windows'])
+    windows = []
+    frames = []
+    for path in list_window_files(raw_data_dir):
+        name = os.path.basename(path)
+        windows.append(name)
+        if name in seen:
+            continue
+        ratings = pd.read_parquet(path, columns=['user_id', 'movie_id', 'rating'])
+        print(f"Delta: {ratings['user_id'].nunique()} users with new ratings in {name}")
+        frames.append(ratings)
+    if not frames:
+        return set(), pd.DataFrame(columns=['user_id', 'movie_id', 'rating']), windows
+
+    new_ratings = pd.concat(frames, ignore_index=True)
+    for column, kind in [('user_id', 'user'), ('movie_id', 'movie')]:
+        codes = load_codes(kind)
+        if codes is not None:
+            new_ratings[column] = new_ratings[column].map(codes)
+    n_users = new_ratings['user_id'].nunique()
+    # Users first seen after the last data prep can't be scored until it runs again;
+    # ratings of new movies still mark their user as changed
+    new_ratings = new_ratings.dropna(subset=['user_id'])
+    if new_ratings['user_id'].nunique() < n_users:
+        print(f"Delta: {n_users - new_ratings['user_id'].nunique()} changed users have no id code yet, skipping them")
+    new_ratings['user_id'] = new_ratings['user_id'].astype('int64')
+    changed = set(new_ratings['user_id'].unique().tolist())
+    new_ratings = new_ratings.dropna(subset=['movie_id'])
+    new_ratings['movie_id'] = new_ratings['movie_id'].astype('int64')
+    return changed, new_ratings, windows
+
+
+def merge_recommendations(path, fresh, rescored_users):
+    # Replace the rows of every rescored user in the existing long-format output
+    import pandas as pd
+
+    if not os.path.exists(path):
+        return fresh
+    existing = pd.read_csv(path)
+    existing = existing[~existing['user_id'].isin(list(rescored_users))]
+    return pd.concat([existing, fresh], ignore_index=True)
+
+
+def existing_users(path):
+    import pandas as pd
+
+    if not os.path.exists(path):
+        return set()
+    return set(pd.read_csv(path, usecols=['user_id'])['user_id'].unique().tolist())
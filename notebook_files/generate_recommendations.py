@@ -0,0 +1,367 @@
+import os
+
+# pandas, numpy, joblib and the model are only loaded once main() or a
+# Recommender is actually used, so importing this module stays cheap
+
+SAMPLE_RECOMMENDATIONS_PATH = 'recommendations/sample_recommendations.csv'
+ITEM_BASED_RECOMMENDATIONS_PATH = 'recommendations/item_based_recommendations.csv'
+
+
+class Recommender:
+    # Trained pipeline plus the movie/user catalogue it scores against
+
+    def __init__(self, pipeline, numerical_features, all_data, trending_scores=None, trending_weight=0.0):
+        import pandas as pd
+
+        self.pipeline = pipeline
+        self.numerical_features = numerical_features
+        self.all_data = all_data
+        self.trending_scores = trending_scores or {}
+        self.trending_weight = trending_weight
+
+        print(f"Total unique movies: {all_data['movie_id'].nunique()}")
+        print(f"Total unique users: {all_data['user_id'].nunique()}")
+
+        # Create a movie lookup by title (if movie_title column exists)
+        if 'movie_title' in all_data.columns:
+            movie_lookup = all_data[['movie_id', 'movie_title']].drop_duplicates()
+            self.movie_lookup = movie_lookup.set_index('movie_id')
+        else:
+            # If no movie titles, create a simple mapping
+            self.movie_lookup = pd.DataFrame(
+                {'movie_title': [f"Movie {id}" for id in all_data['movie_id'].unique()]},
+                index=all_data['movie_id'].unique()
+            )
+            print("Warning: No movie_title column found. Using generic movie titles.")
+
+        # Get a list of unique movie IDs and users
+        self.unique_movies = all_data['movie_id'].unique()
+        self.unique_users = all_data['user_id'].unique()
+
+    @classmethod
+    def load(cls, trending_scores=None, trending_weight=0.0):
+        import pandas as pd
+        import joblib
+        from model_host import load_scoring_model
+
+        # Load the trained model and feature list
+        pipeline = load_scoring_model()
+        numerical_features = joblib.load('models/feature_list.pkl')
+
+        # Load the movie data
+        X_train = pd.read_csv('data/X_train.csv')
+        X_test = pd.read_csv('data/X_test.csv')
+
+        # Combine train and test data to get all movies
+        all_data = pd.concat([X_train, X_test])
+        return cls(pipeline, numerical_features, all_data, trending_scores, trending_weight)
+
+    def candidate_movies(self, user_id):
+        import pandas as pd
+
+        all_data = self.all_data
+        # Create a dataframe with all movies for this user
+        user_movies = pd.DataFrame({'user_id': [user_id] * len(self.unique_movies)})
+        user_movies['movie_id'] = self.unique_movies
+
+        # Add required features with placeholder values
+        for feature in self.numerical_features:
+            if feature not in user_movies.columns:
+                if feature == 'release_year' and 'release_year' in all_data.columns:
+                    # Use median of release year for each movie if available
+                    movie_years = all_data.groupby('movie_id')['release_year'].median().to_dict()
+                    user_movies['release_year'] = user_movies['movie_id'].map(
+                        lambda x: movie_years.get(x, all_data['release_year'].median())
+                    )
+                else:
+                    # For other features, use median value from all_data
+                    if feature in all_data.columns and feature not in ['user_id', 'movie_id']:
+                        user_movies[feature] = all_data[feature].median()
+                    else:
+                        # Default to 0 if we can't get a sensible value
+                        user_movies[feature] = 0
+
+        # Ensure all required features are present for prediction
+        for feature in self.numerical_features:
+            if feature not in user_movies.columns:
+                raise ValueError(f"Required feature '{feature}' missing and couldn't be generated")
+
+        # Predict ratings
+        user_movies['predicted_rating'] = self.pipeline.predict(user_movies[self.numerical_features])
+        return user_movies
+
+    def generate_recommendations(self, user_id, n_recommendations=5, exclude=None):
+        user_movies = self.candidate_movies(user_id)
+        if exclude is not None and len(exclude):
+            # Movies the user has already rated
+            user_movies = user_movies[~user_movies['movie_id'].isin(exclude)]
+
+        # Sort by rating (descending), blending in recency when a trending weight is set
+        if self.trending_weight > 0 and self.trending_scores:
+            user_movies['ranking_score'] = user_movies['predicted_rating'] + self.trending_weight * (
+                user_movies['movie_id'].map(self.trending_scores).fillna(0.0)
+            )
+            user_movies = user_movies.sort_values('ranking_score', ascending=False)
+        else:
+            user_movies = user_movies.sort_values('predicted_rating', ascending=False)
+
+        # Get the top n recommendations
+        top_recommendations = user_movies.head(n_recommendations)
+
+        # Add movie titles
+        top_recommendations = top_recommendations.join(self.movie_lookup, on='movie_id')
+
+        return top_recommendations[['movie_id', 'movie_title', 'predicted_rating']]
+
+
+def update_trending():
+    from trending import TrendingScores, STREAM_STATE_PATH, combined_scores
+    from id_codes import load_codes
+
+    # Bring the decayed trending counters up to date with any new rating windows.
+    # Only windows not seen by the previous run are read, so this does not rescan history.
+    print("Updating trending scores...")
+    half_life_hours = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', '24'))
+    trending = TrendingScores.load(half_life_hours=half_life_hours)
+    # Add the stream consumer's live counters, which include events not rolled
+    # into a window yet. Windows it did roll are already in its counters.
+    stream = TrendingScores.load(STREAM_STATE_PATH, half_life_hours=half_life_hours)
+    trending.processed_files |= stream.processed_files
+    trending.update_from_windows()
+    trending.save()
+    raw_scores = combined_scores([trending, stream])
+
+    # Counters are keyed on raw movie ids, which stay stable across prep runs;
+    # translate them to the codes the model and catalogue use
+    trending_scores = raw_scores
+    movie_codes = load_codes('movie')
+    if movie_codes is not None:
+        trending_scores = {
+            movie_codes[movie_id]: score for movie_id, score in trending_scores.items() if movie_id in movie_codes
+        }
+
+    # Normalise to [0, 1] so the weight is on the same scale for every run
+    max_trending_score = max(trending_scores.values()) if trending_scores else 0.0
+    if max_trending_score > 0:
+        trending_scores = {movie_id: score / max_trending_score for movie_id, score in trending_scores.items()}
+    return raw_scores, trending_scores, movie_codes
+
+
+def check_trending_keys(trending_scores, unique_movies, trending_weight):
+    # A key mismatch would make the trending blend a silent no-op. That is only
+    # an error when the blend is in use; otherwise it just affects trending_movies.csv
+    if not trending_scores or any(movie_id in trending_scores for movie_id in unique_movies):
+        return
+    message = ("No trending movie id matches the catalogue; check that models/movie_codes.pkl "
+               "comes from the same data prep run as data/X_train.csv")
+    if trending_weight > 0:
+        raise ValueError(message)
+    print(f"Warning: {message}")
+
+
+def generate_sample_recommendations(recommender, sample_users, rated_movies=None):
+    import pandas as pd
+
+    # rated_movies: {user_id: movie ids to leave out}, for delta runs
+    rated_movies = rated_movies or {}
+    recommendations_output = pd.DataFrame()
+    for user_id in sample_users:
+        print(f"Generating recommendations for user {user_id}")
+        user_recommendations = recommender.generate_recommendations(user_id, exclude=rated_movies.get(user_id))
+        user_recommendations['user_id'] = user_id
+        recommendations_output = pd.concat([recommendations_output, user_recommendations])
+    return recommendations_output
+
+
+def publish_store(recommendations_output):
+    from atomic_publish import publish
+    from rec_store import write_store, store_lock, DEFAULT_STORE_ROOT
+
+    # Same recommendations in the mmap store that serves single-user lookups.
+    # The stream consumer re-applies its fresher per-user lists on top once it
+    # sees this version.
+    with store_lock(DEFAULT_STORE_ROOT):
+        version = write_store(recommendations_output, DEFAULT_STORE_ROOT)
+        publish(version, DEFAULT_STORE_ROOT)
+    print(f"Published recommendation store version {version} to {DEFAULT_STORE_ROOT}")
+
+
+def load_history(new_ratings=None):
+    import pandas as pd
+    from item_similarity import load_ratings
+
+    # Every known rating: the CSV splits, which only cover windows up to the last
+    # data prep, plus the ratings a delta run found in newer windows
+    history = load_ratings()
+    if new_ratings is not None and len(new_ratings):
+        history = pd.concat([history, new_ratings[['user_id', 'movie_id', 'rating']]], ignore_index=True)
+        # Window ratings are newer than anything in the splits
+        history = history.drop_duplicates(['user_id', 'movie_id'], keep='last')
+    return history
+
+
+def generate_item_based_recommendations(recommender, sample_users, history=None):
+    import pandas as pd
+    from item_similarity import ItemNeighbours, DEFAULT_NEIGHBOURS_PATH
+
+    # Item-based recommendations for the same users from their rating history
+    if not os.path.exists(DEFAULT_NEIGHBOURS_PATH):
+        print(f"Warning: {DEFAULT_NEIGHBOURS_PATH} not found. Skipping item-based recommendations.")
+        return None
+
+    print("Generating item-based recommendations for sample users...")
+    neighbours = ItemNeighbours.load(DEFAULT_NEIGHBOURS_PATH)
+    if history is None:
+        history = load_history()
+    user_histories = history.groupby('user_id')
+    item_based_output = pd.DataFrame()
+    for user_id in sample_users:
+        if user_id not in user_histories.groups:
+            continue
+        history = user_histories.get_group(user_id)
+        item_recommendations = neighbours.recommend(history['movie_id'].values, history['rating'].values)
+        item_recommendations = item_recommendations.join(recommender.movie_lookup, on='movie_id')
+        item_recommendations['user_id'] = user_id
+        item_based_output = pd.concat([item_based_output, item_recommendations])
+    return item_based_output
+
+
+def generate_top_movies(recommender, sample_size=100, n_movies=20):
+    import numpy as np
+    import pandas as pd
+
+    all_users_ratings = pd.DataFrame()
+
+    # Sample a subset of users if there are too many
+    sample_size = min(sample_size, len(recommender.unique_users))
+    user_sample = np.random.choice(recommender.unique_users, sample_size, replace=False)
+
+    for user_id in user_sample:
+        # For each user, get predictions for all movies
+        all_users_ratings = pd.concat([all_users_ratings, recommender.candidate_movies(user_id)])
+
+    # Calculate average predicted rating per movie
+    avg_ratings = all_users_ratings.groupby('movie_id')['predicted_rating'].mean().reset_index()
+    avg_ratings = avg_ratings.sort_values('predicted_rating', ascending=False)
+
+    # Get top movies
+    top_movies = avg_ratings.head(n_movies)
+    return top_movies.join(recommender.movie_lookup, on='movie_id')
+
+
+def plan_delta_refresh(version, trending_version):
+    from delta_refresh import load_state, find_changed_users, existing_users
+
+    # Users to rescore, whether the model changed, the ratings in new windows and
+    # the windows this plan covers; None when there is no previous run to refresh from
+    state = load_state()
+    if state is None or not os.path.exists(SAMPLE_RECOMMENDATIONS_PATH):
+        print("Delta: no previous run found, falling back to a full run")
+        return None
+    users, new_ratings, windows = find_changed_users(state)
+    # A new model scores every user differently, and a changed trending blend
+    # re-ranks every user's list, so both invalidate the whole existing output
+    model_changed = state.get('model_version') != version
+    if model_changed:
+        print("Delta: model changed, rescoring every user in the existing output")
+    elif state.get('trending_version') != trending_version:
+        print("Delta: trending blend changed, rescoring every user in the existing output")
+    if model_changed or state.get('trending_version') != trending_version:
+        users |= existing_users(SAMPLE_RECOMMENDATIONS_PATH)
+        users |= existing_users(ITEM_BASED_RECOMMENDATIONS_PATH)
+    print(f"Delta: rescoring {len(users)} users")
+    return sorted(users), model_changed, new_ratings, windows
+
+
+def main():
+    import heapq
+    import numpy as np
+    import pandas as pd
+    from delta_refresh import model_version, trending_version, save_state, current_windows, merge_recommendations
+
+    raw_trending_scores, trending_scores, movie_codes = update_trending()
+
+    print("Loading model and data...")
+    recommender = Recommender.load(
+        trending_scores=trending_scores,
+        trending_weight=float(os.environ.get('TRENDING_WEIGHT', '0.0')),
+    )
+    check_trending_keys(trending_scores, recommender.unique_movies, recommender.trending_weight)
+
+    # Create a directory for recommendations
+    os.makedirs('recommendations', exist_ok=True)
+
+    # RECOMMEND_MODE=delta rescores only users with new ratings since the last run
+    version = model_version()
+    blend_version = trending_version(trending_scores, recommender.trending_weight)
+    plan = None
+    if os.environ.get('RECOMMEND_MODE', 'full') == 'delta':
+        plan = plan_delta_refresh(version, blend_version)
+
+    history = None
+    rated_movies = None
+    if plan is not None:
+        sample_users, model_changed, new_ratings, windows = plan
+        # Rescored users get lists without anything they have rated, including
+        # in windows newer than the last data prep
+        history = load_history(new_ratings)
+        rated = history[history['user_id'].isin(sample_users)]
+        rated_movies = rated.groupby('user_id')['movie_id'].apply(list).to_dict()
+    else:
+        # Generate recommendations for 5 sample users, or for everyone with N_RECOMMEND_USERS=all
+        print("Generating recommendations for sample users...")
+        windows = current_windows()
+        unique_users = recommender.unique_users
+        n_users = os.environ.get('N_RECOMMEND_USERS', '5')
+        if n_users == 'all':
+            sample_users = unique_users
+        else:
+            sample_users = np.random.choice(unique_users, min(int(n_users), len(unique_users)), replace=False)
+    recommendations_output = generate_sample_recommendations(recommender, sample_users, rated_movies)
+    if plan is not None:
+        recommendations_output = merge_recommendations(
+            SAMPLE_RECOMMENDATIONS_PATH, recommendations_output, sample_users
+        )
+
+    # Save recommendations to a CSV file
+    recommendations_output.to_csv(SAMPLE_RECOMMENDATIONS_PATH, index=False)
+    publish_store(recommendations_output)
+
+    item_based_output = generate_item_based_recommendations(recommender, sample_users, history)
+    if item_based_output is not None:
+        if plan is not None:
+            item_based_output = merge_recommendations(
+                ITEM_BASED_RECOMMENDATIONS_PATH, item_based_output, sample_users
+            )
+        item_based_output.to_csv(ITEM_BASED_RECOMMENDATIONS_PATH, index=False)
+
+    # Generate overall top movies; a delta run only needs this when the model changed
+    if plan is None or model_changed:
+        print("Generating overall top movies...")
+        top_movies = generate_top_movies(recommender)
+        top_movies.to_csv('recommendations/top_movies_overall.csv', index=False)
+
+    # Top trending movies by decayed rating activity
+    print("Generating trending movies...")
+    trending_movies = pd.DataFrame(
+        heapq.nlargest(20, raw_trending_scores.items(), key=lambda item: item[1]),
+        columns=['raw_movie_id', 'trending_score'],
+    )
+    if movie_codes is not None:
+        # Movies first seen after the last data prep have no code yet and are dropped
+        trending_movies['movie_id'] = trending_movies['raw_movie_id'].map(movie_codes)
+        trending_movies = trending_movies.dropna(subset=['movie_id'])
+        trending_movies['movie_id'] = trending_movies['movie_id'].astype('int64')
+    else:
+        trending_movies['movie_id'] = trending_movies['raw_movie_id']
+    trending_movies = trending_movies.join(recommender.movie_lookup, on='movie_id')
+    trending_movies.to_csv('recommendations/trending_movies.csv', index=False)
+
+    # Record what this run covered so the next delta run starts from here
+    save_state(windows, version, blend_version)
+
+    print("Recommendation generation completed successfully!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import os
+import joblib
+
+# Data prep replaces non-numeric user/movie ids with category codes, and the
+# model, the CSV splits and everything scored from them use those codes. The
+# raw-id -> code table of the last prep run is kept here so code that reads raw
+# ids (rating windows, the rating stream) can be put on the same keys.
+CODES_PATH_TEMPLATE = 'models/{kind}_codes.pkl'
+
+
+def encode_and_save(series, kind):
+    # Category codes for a raw id column, persisting the mapping used
+    categorical = series.astype('category')
+    codes = {raw_id: code for code, raw_id in enumerate(categorical.cat.categories)}
+    path = CODES_PATH_TEMPLATE.format(kind=kind)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(codes, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    print(f"Saved {len(codes)} {kind} id codes to {path}")
+    return categorical.cat.codes
+
+
+def load_codes(kind):
+    # raw id -> code, or None when data prep kept the raw ids (they were already numeric)
+    path = CODES_PATH_TEMPLATE.format(kind=kind)
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
+
+
+def clear_codes(kind):
+    # A prep run that keeps raw ids must not leave a stale table from an earlier run
+    path = CODES_PATH_TEMPLATE.format(kind=kind)
+    if os.path.exists(path):
+        os.remove(path)
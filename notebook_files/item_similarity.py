@@ -0,0 +1,147 @@
+import os
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from joblib import Parallel, delayed
+
+DEFAULT_NEIGHBOURS_PATH = 'models/item_neighbours.npz'
+DEFAULT_TOP_K = 50
+DEFAULT_BLOCK_SIZE = 1000
+
+
+def load_ratings(data_dir='data', splits=('train', 'test')):
+    # (user, movie, rating) triples from the splits written by data prep. The
+    # neighbour model is built from 'train' only so evaluation rows stay unseen.
+    frames = []
+    for split in splits:
+        X = pd.read_csv(os.path.join(data_dir, f'X_{split}.csv'), usecols=['user_id', 'movie_id'])
+        y = pd.read_csv(os.path.join(data_dir, f'y_{split}.csv'))
+        X['rating'] = y['rating'].values
+        frames.append(X)
+    ratings = pd.concat(frames, ignore_index=True)
+    # The splits are shuffled and carry no timestamp, so there is no "latest" rating
+    # to keep; average repeated ratings of the same movie by the same user
+    return ratings.groupby(['user_id', 'movie_id'], as_index=False)['rating'].mean()
+
+
+def build_item_user_matrix(ratings):
+    # Rows are movies, columns are users, each row scaled to unit length so
+    # that a row-by-row dot product is the cosine similarity between movies
+    movie_ids, movie_index = np.unique(ratings['movie_id'].values, return_inverse=True)
+    _, user_index = np.unique(ratings['user_id'].values, return_inverse=True)
+    matrix = sp.csr_matrix(
+        (ratings['rating'].values.astype(np.float32), (movie_index, user_index)),
+        shape=(len(movie_ids), user_index.max() + 1),
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    matrix = sp.diags(1.0 / norms).dot(matrix).tocsr().astype(np.float32)
+    return movie_ids, matrix
+
+
+def _top_k_block(matrix, matrix_t, start, stop, k):
+    # Similarities for rows [start, stop) against every movie, cut to the top k per row
+    block = (matrix[start:stop] @ matrix_t).tocsr()
+    # A movie is not its own neighbour; its self-similarity sits on diagonal offset `start`
+    block.setdiag(0, k=start)
+    block.eliminate_zeros()
+
+    counts = np.zeros(stop - start, dtype=np.int64)
+    indices = []
+    data = []
+    for row in range(stop - start):
+        lo, hi = block.indptr[row], block.indptr[row + 1]
+        row_indices = block.indices[lo:hi]
+        row_data = block.data[lo:hi]
+        if hi - lo > k:
+            keep = np.argpartition(row_data, -k)[-k:]
+            row_indices = row_indices[keep]
+            row_data = row_data[keep]
+        order = np.argsort(row_data)[::-1]
+        indices.append(row_indices[order])
+        data.append(row_data[order])
+        counts[row] = len(order)
+    return counts, indices, data
+
+
+def build_neighbours(ratings, k=DEFAULT_TOP_K, block_size=DEFAULT_BLOCK_SIZE, n_jobs=-1):
+    movie_ids, matrix = build_item_user_matrix(ratings)
+    matrix_t = matrix.T.tocsc()
+    n_movies = len(movie_ids)
+    print(f"Computing top-{k} neighbours for {n_movies} movies in blocks of {block_size}")
+
+    blocks = Parallel(n_jobs=n_jobs)(
+        delayed(_top_k_block)(matrix, matrix_t, start, min(start + block_size, n_movies), k)
+        for start in range(0, n_movies, block_size)
+    )
+
+    counts = np.concatenate([block[0] for block in blocks])
+    indptr = np.zeros(n_movies + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    indices = np.concatenate([row for block in blocks for row in block[1]] or [np.empty(0)]).astype(np.int32)
+    data = np.concatenate([row for block in blocks for row in block[2]] or [np.empty(0)]).astype(np.float32)
+    return movie_ids, indptr, indices, data
+
+
+def save_neighbours(path, movie_ids, indptr, indices, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, movie_ids=movie_ids, indptr=indptr, indices=indices, data=data)
+    os.replace(tmp_path, path)
+
+
+class ItemNeighbours:
+    # Top-K neighbour lists stored as a CSR movie x movie similarity matrix
+
+    def __init__(self, movie_ids, similarity):
+        self.movie_ids = movie_ids
+        self.similarity = similarity
+        self.movie_index = pd.Series(np.arange(len(movie_ids)), index=movie_ids)
+
+    @classmethod
+    def load(cls, path=DEFAULT_NEIGHBOURS_PATH):
+        arrays = np.load(path)
+        n_movies = len(arrays['movie_ids'])
+        similarity = sp.csr_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']), shape=(n_movies, n_movies)
+        )
+        return cls(arrays['movie_ids'], similarity)
+
+    def similar_movies(self, movie_id, n=10):
+        row = self.movie_index.get(movie_id)
+        if row is None:
+            return pd.DataFrame(columns=['movie_id', 'similarity'])
+        lo, hi = self.similarity.indptr[row], self.similarity.indptr[row + 1]
+        return pd.DataFrame({
+            'movie_id': self.movie_ids[self.similarity.indices[lo:hi][:n]],
+            'similarity': self.similarity.data[lo:hi][:n],
+        })
+
+    def recommend(self, history_movie_ids, history_ratings, n=5):
+        # Gather the neighbour rows of every movie in the history at once and
+        # sum them weighted by the user's ratings
+        rows = self.movie_index.reindex(history_movie_ids).values
+        known = ~np.isnan(rows)
+        if not known.any():
+            return pd.DataFrame(columns=['movie_id', 'item_score'])
+        rows = rows[known].astype(np.int64)
+        weights = np.asarray(history_ratings, dtype=np.float32)[known]
+        scores = np.asarray(self.similarity[rows].T @ weights).ravel()
+        scores[rows] = 0.0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > n:
+            candidates = candidates[np.argpartition(scores[candidates], -n)[-n:]]
+        candidates = candidates[np.argsort(scores[candidates])[::-1]]
+        return pd.DataFrame({'movie_id': self.movie_ids[candidates], 'item_score': scores[candidates]})
+
+
+if __name__ == '__main__':
+    ratings = load_ratings(splits=('train',))
+    movie_ids, indptr, indices, data = build_neighbours(
+        ratings,
+        k=int(os.environ.get('ITEM_NEIGHBOURS_K', DEFAULT_TOP_K)),
+        block_size=int(os.environ.get('ITEM_NEIGHBOURS_BLOCK_SIZE', DEFAULT_BLOCK_SIZE)),
+    )
+    save_neighbours(DEFAULT_NEIGHBOURS_PATH, movie_ids, indptr, indices, data)
+    print(f"Saved {len(indices)} neighbour pairs for {len(movie_ids)} movies to {DEFAULT_NEIGHBOURS_PATH}")
@@ -0,0 +1,179 @@
+import os
+import json
+import shutil
+import time
+
+import numpy as np
+
+from atomic_publish import new_version, publish, current_version
+
+# Read-only, memory-mapped copy of the trained pipeline for scoring workers.
+#
+# Instead of every process unpickling models/movie_recommender.pkl, the training
+# step exports the fitted arrays (imputer statistics, scaler, and the forest's
+# nodes flattened across all trees) as .npy files under
+#   models/shared/versions/<version>/
+# and points models/shared/CURRENT at it. Workers open the arrays with
+# mmap_mode='r', so they all share one copy through the page cache, and pick up
+# a newly published version the next time they check CURRENT.
+DEFAULT_HOST_ROOT = 'models/shared'
+
+
+def export_pipeline(pipeline, numerical_features, X_check, root=DEFAULT_HOST_ROOT):
+    # Write the fitted arrays of an imputer -> [scaler] -> model pipeline as a new
+    # version, after checking it scores X_check the same as the pipeline itself
+    arrays = {}
+    steps = dict(pipeline.steps)
+    meta = {'features': list(numerical_features), 'scale': 'scaler' in steps}
+
+    arrays['imputer_statistics'] = np.asarray(steps['imputer'].statistics_, dtype=np.float64)
+    if meta['scale']:
+        arrays['scaler_mean'] = np.asarray(steps['scaler'].mean_, dtype=np.float64)
+        arrays['scaler_scale'] = np.asarray(steps['scaler'].scale_, dtype=np.float64)
+
+    model = steps['model']
+    if hasattr(model, 'estimators_'):
+        # Concatenate every tree's nodes; child pointers are shifted to global
+        # node ids so one traversal loop walks all trees at once
+        meta['model'] = 'forest'
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        left, right = [], []
+        for tree, offset in zip(trees, offsets):
+            left.append(np.where(tree.children_left == -1, -1, tree.children_left + offset))
+            right.append(np.where(tree.children_right == -1, -1, tree.children_right + offset))
+        arrays['roots'] = offsets[:-1].astype(np.int64)
+        arrays['children_left'] = np.concatenate(left).astype(np.int64)
+        arrays['children_right'] = np.concatenate(right).astype(np.int64)
+        arrays['feature'] = np.concatenate([tree.feature for tree in trees]).astype(np.int64)
+        arrays['threshold'] = np.concatenate([tree.threshold for tree in trees]).astype(np.float64)
+        arrays['value'] = np.concatenate([tree.value[:, 0, 0] for tree in trees]).astype(np.float64)
+    elif hasattr(model, 'coef_'):
+        meta['model'] = 'linear'
+        arrays['coef'] = np.asarray(model.coef_, dtype=np.float64).ravel()
+        arrays['intercept'] = np.asarray([model.intercept_], dtype=np.float64).ravel()
+    else:
+        raise ValueError(f"Can't export model of type {type(model).__name__} for shared hosting")
+
+    version, version_dir = new_version(root)
+    for name, array in arrays.items():
+        np.save(os.path.join(version_dir, f'{name}.npy'), array)
+    with open(os.path.join(version_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    # The traversal above re-implements sklearn's predict, so never publish a
+    # version that disagrees with the fitted pipeline
+    X_check = X_check[list(numerical_features)]
+    expected = pipeline.predict(X_check)
+    exported = _LoadedModel(version_dir).predict(X_check.values)
+    if not np.allclose(expected, exported):
+        shutil.rmtree(version_dir)
+        worst = np.max(np.abs(expected - exported))
+        raise ValueError(f"Exported model disagrees with the fitted pipeline "
+                         f"(max abs difference {worst:.6g} over {len(X_check)} rows); not publishing")
+    return version
+
+
+def publish_pipeline(pipeline, numerical_features, X_check, root=DEFAULT_HOST_ROOT):
+    version = export_pipeline(pipeline, numerical_features, X_check, root)
+    publish(version, root)
+    return version
+
+
+class _LoadedModel:
+    # One version's arrays; replaced as a whole on hot swap so a predict call
+    # never mixes arrays from two versions
+
+    def __init__(self, version_dir, chunk_size=10000):
+        self.chunk_size = chunk_size
+        with open(os.path.join(version_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.arrays = {
+            name[:-len('.npy')]: np.load(os.path.join(version_dir, name), mmap_mode='r')
+            for name in os.listdir(version_dir) if name.endswith('.npy')
+        }
+
+    def predict(self, X):
+        arrays = self.arrays
+        X = np.array(X, dtype=np.float64)
+        missing = np.isnan(X)
+        if missing.any():
+            X[missing] = np.take(arrays['imputer_statistics'], np.nonzero(missing)[1])
+        if self.meta['scale']:
+            X -= arrays['scaler_mean']
+            X /= arrays['scaler_scale']
+
+        if self.meta['model'] == 'linear':
+            return X @ arrays['coef'] + arrays['intercept'][0]
+
+        # sklearn trees compare float32 features against float64 thresholds
+        X = X.astype(np.float32)
+        # Rows are traversed a chunk at a time so the (sample, tree) cursors stay
+        # at chunk_size * n_trees entries however many rows are scored
+        return np.concatenate([
+            self._predict_forest(X[i:i + self.chunk_size])
+            for i in range(0, len(X), self.chunk_size)
+        ]) if len(X) else np.empty(0)
+
+    def _predict_forest(self, X):
+        arrays = self.arrays
+        left, right = arrays['children_left'], arrays['children_right']
+        feature, threshold = arrays['feature'], arrays['threshold']
+        roots = np.asarray(arrays['roots'])
+        n_samples, n_trees = len(X), len(roots)
+
+        # One (sample, tree) cursor per pair, advanced a level at a time until all sit on leaves
+        nodes = np.tile(roots, n_samples)
+        samples = np.repeat(np.arange(n_samples), n_trees)
+        active = np.flatnonzero(left[nodes] != -1)
+        while len(active):
+            current = nodes[active]
+            go_left = X[samples[active], feature[current]] <= threshold[current]
+            nodes[active] = np.where(go_left, left[current], right[current])
+            active = active[left[nodes[active]] != -1]
+        return np.asarray(arrays['value'])[nodes].reshape(n_samples, n_trees).mean(axis=1)
+
+
+class SharedModel:
+    # Drop-in replacement for the unpickled pipeline's predict(), backed by the
+    # memory-mapped arrays of the live version
+
+    def __init__(self, root=DEFAULT_HOST_ROOT, refresh_interval=5.0):
+        self.root = root
+        self.refresh_interval = refresh_interval
+        self.version = None
+        self._model = None
+        self._next_check = 0.0
+        if not self.refresh():
+            raise FileNotFoundError(f"No shared model has been published under {root}")
+
+    @property
+    def features(self):
+        return self._model.meta['features']
+
+    def refresh(self):
+        self._next_check = time.monotonic() + self.refresh_interval
+        version = current_version(self.root)
+        if version is None or version == self.version:
+            return False
+        model = _LoadedModel(os.path.join(self.root, 'versions', version))
+        self._model, self.version = model, version
+        print(f"Attached to shared model version {version}")
+        return True
+
+    def predict(self, X):
+        if time.monotonic() >= self._next_check:
+            self.refresh()
+        if hasattr(X, 'columns'):
+            X = X[self.features].values
+        return self._model.predict(X)
+
+
+def load_scoring_model(model_path='models/movie_recommender.pkl'):
+    # The shared model whenever training has published one, so every scoring
+    # process maps the same arrays; USE_SHARED_MODEL=0 falls back to a private
+    # unpickled copy as before
+    if os.environ.get('USE_SHARED_MODEL', '1') != '0' and current_version(DEFAULT_HOST_ROOT) is not None:
+        return SharedModel()
+    import joblib
+    return joblib.load(model_path)
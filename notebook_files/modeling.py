@@ -0,0 +1,67 @@
+import os
+import json
+
+TUNING_CONFIG_PATH = 'models/tuning_config.json'
+
+# The pipeline 02-train-model.py has always trained
+DEFAULT_CONFIG = {
+    'model': 'random_forest',
+    'imputer_strategy': 'median',
+    'scale': True,
+    'n_estimators': 100,
+    'max_depth': None,
+    'min_samples_leaf': 1,
+    'max_features': 1.0,
+}
+
+
+def select_features(X):
+    # User ID and movie ID are essential for collaborative filtering
+    numerical_features = ['user_id', 'movie_id']
+
+    # Add release_year if available
+    if 'release_year' in X.columns:
+        numerical_features.append('release_year')
+
+    # Add any other numerical features that might be in the Kafka data
+    for col in X.columns:
+        if X[col].dtype in ['int64', 'float64'] and col not in numerical_features:
+            numerical_features.append(col)
+    return numerical_features
+
+
+def build_pipeline(config=None, n_jobs=None):
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.impute import SimpleImputer
+
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    steps = [('imputer', SimpleImputer(strategy=config['imputer_strategy']))]
+    if config['scale']:
+        steps.append(('scaler', StandardScaler()))
+
+    if config['model'] == 'random_forest':
+        from sklearn.ensemble import RandomForestRegressor
+        model = RandomForestRegressor(
+            n_estimators=config['n_estimators'],
+            max_depth=config['max_depth'],
+            min_samples_leaf=config['min_samples_leaf'],
+            max_features=config['max_features'],
+            n_jobs=n_jobs,
+            random_state=42,
+        )
+    elif config['model'] == 'ridge':
+        from sklearn.linear_model import Ridge
+        model = Ridge(alpha=config.get('alpha', 1.0))
+    else:
+        raise ValueError(f"Unknown model type '{config['model']}'")
+    steps.append(('model', model))
+    return Pipeline(steps)
+
+
+def load_tuned_config(path=TUNING_CONFIG_PATH):
+    # Config chosen by tune.py, or the default pipeline if tuning has not been run
+    if not os.path.exists(path):
+        return dict(DEFAULT_CONFIG)
+    with open(path) as f:
+        return dict(DEFAULT_CONFIG, **json.load(f))
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import fcntl
+from contextlib import contextmanager
+
+import numpy as np
+
+from atomic_publish import new_version, publish, current_version
+
+# On-disk store of precomputed per-user recommendations, published as
+# versions with atomic_publish.
+#
+#   <root>/CURRENT                 name of the live version
+#   <root>/versions/<version>/
+#       meta.json                  k, number of users, hash table size
+#       catalog.npy    int64[m]    movie ids; recommendations store indices into this
+#       movies.npy     int32[n,k]  catalog index per slot, -1 where a user has fewer than k
+#       scores.npy     float16[n,k]
+#       hash_keys.npy  int64[t]    open-addressing table of user ids ...
+#       hash_rows.npy  int32[t]    ... and the row each one maps to, -1 for empty
+#
+# Every array is opened with mmap, so a lookup touches one hash probe sequence and
+# one row, and all reader processes on a host share the same page cache.
+DEFAULT_STORE_ROOT = 'recommendations/store'
+
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_MASK_64 = (1 << 64) - 1
+
+
+def _hash_bits(n_users):
+    # Table at most half full so probe sequences stay short
+    return max(4, int(np.ceil(np.log2(max(1, n_users) * 2))))
+
+
+def _slot(user_id, bits):
+    return ((int(user_id) * _HASH_MULTIPLIER) & _MASK_64) >> (64 - bits)
+
+
+def build_hash_index(user_ids):
+    bits = _hash_bits(len(user_ids))
+    size = 1 << bits
+    keys = np.zeros(size, dtype=np.int64)
+    rows = np.full(size, -1, dtype=np.int32)
+    mask = size - 1
+    for row, user_id in enumerate(user_ids):
+        slot = _slot(user_id, bits)
+        while rows[slot] != -1:
+            if keys[slot] == user_id:
+                raise ValueError(f"Duplicate user id {user_id} in recommendation store")
+            slot = (slot + 1) & mask
+        keys[slot] = user_id
+        rows[slot] = row
+    return bits, keys, rows
+
+
+def write_store(recommendations, root=DEFAULT_STORE_ROOT, k=None, score_column='predicted_rating'):
+    # recommendations is the long-format frame the recommend step writes to CSV:
+    # one row per (user_id, movie_id) with a score, best first within each user
+    recommendations = recommendations[['user_id', 'movie_id', score_column]]
+    catalog, movie_index = np.unique(recommendations['movie_id'].values, return_inverse=True)
+    user_ids, user_row = np.unique(recommendations['user_id'].values.astype(np.int64), return_inverse=True)
+
+    # Position of each recommendation within its user's list, in input order
+    order = np.argsort(user_row, kind='stable')
+    user_row_sorted = user_row[order]
+    starts = np.searchsorted(user_row_sorted, np.arange(len(user_ids)))
+    position = np.arange(len(order)) - starts[user_row_sorted]
+    if k is None:
+        k = int(position.max()) + 1 if len(position) else 0
+    keep = position < k
+
+    movies = np.full((len(user_ids), k), -1, dtype=np.int32)
+    scores = np.full((len(user_ids), k), np.nan, dtype=np.float16)
+    movies[user_row_sorted[keep], position[keep]] = movie_index[order][keep]
+    scores[user_row_sorted[keep], position[keep]] = recommendations[score_column].values[order][keep]
+
+    bits, hash_keys, hash_rows = build_hash_index(user_ids)
+
+    version, version_dir = new_version(root)
+    np.save(os.path.join(version_dir, 'catalog.npy'), catalog.astype(np.int64))
+    np.save(os.path.join(version_dir, 'movies.npy'), movies)
+    np.save(os.path.join(version_dir, 'scores.npy'), scores)
+    np.save(os.path.join(version_dir, 'hash_keys.npy'), hash_keys)
+    np.save(os.path.join(version_dir, 'hash_rows.npy'), hash_rows)
+    with open(os.path.join(version_dir, 'meta.json'), 'w') as f:
+        json.dump({'k': k, 'n_users': len(user_ids), 'hash_bits': bits}, f)
+    return version
+
+
+@contextmanager
+def store_lock(root=DEFAULT_STORE_ROOT):
+    # Serialises writers that build a version from the live one (the recommend
+    # step and the stream consumer) so neither publishes over the other's
+    # changes unseen. Readers never take it.
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, 'LOCK'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_store(root=DEFAULT_STORE_ROOT, score_column='predicted_rating'):
+    # The live version back in the long format write_store takes, or None
+    import pandas as pd
+
+    version = current_version(root)
+    if version is None:
+        return None
+    version_dir = os.path.join(root, 'versions', version)
+    catalog = np.load(os.path.join(version_dir, 'catalog.npy'))
+    movies = np.load(os.path.join(version_dir, 'movies.npy'))
+    scores = np.load(os.path.join(version_dir, 'scores.npy'))
+    hash_keys = np.load(os.path.join(version_dir, 'hash_keys.npy'))
+    hash_rows = np.load(os.path.join(version_dir, 'hash_rows.npy'))
+
+    occupied = hash_rows >= 0
+    user_ids = np.empty(len(movies), dtype=np.int64)
+    user_ids[hash_rows[occupied]] = hash_keys[occupied]
+    # Row-major order keeps every user's list best first
+    row, position = np.nonzero(movies >= 0)
+    return pd.DataFrame({
+        'user_id': user_ids[row],
+        'movie_id': catalog[movies[row, position]],
+        score_column: scores[row, position].astype(np.float64),
+    })
+
+
+def merge_store(updates, users, root=DEFAULT_STORE_ROOT, score_column='predicted_rating'):
+    # Publish a new version with the lists of `users` replaced by their rows in
+    # `updates` (a user with no rows is dropped). Cost is O(store size), not
+    # O(users scored).
+    import pandas as pd
+
+    with store_lock(root):
+        current = read_store(root, score_column)
+        if current is not None:
+            current = current[~current['user_id'].isin(list(users))]
+            updates = pd.concat([current, updates[['user_id', 'movie_id', score_column]]], ignore_index=True)
+        version = write_store(updates, root, score_column=score_column)
+        publish(version, root)
+    return version
+
+
+class RecommendationStore:
+    # Read-only view of the live version; picks up a newly published version
+    # at most every refresh_interval seconds
+
+    def __init__(self, root=DEFAULT_STORE_ROOT, refresh_interval=1.0):
+        self.root = root
+        self.refresh_interval = refresh_interval
+        self.version = None
+        self._next_check = 0.0
+        self.refresh()
+
+    def refresh(self):
+        self._next_check = time.monotonic() + self.refresh_interval
+        version = current_version(self.root)
+        if version is None or version == self.version:
+            return False
+        version_dir = os.path.join(self.root, 'versions', version)
+        with open(os.path.join(version_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        self.k = meta['k']
+        self.n_users = meta['n_users']
+        self.hash_bits = meta['hash_bits']
+        self.catalog = np.load(os.path.join(version_dir, 'catalog.npy'), mmap_mode='r')
+        self.movies = np.load(os.path.join(version_dir, 'movies.npy'), mmap_mode='r')
+        self.scores = np.load(os.path.join(version_dir, 'scores.npy'), mmap_mode='r')
+        self.hash_keys = np.load(os.path.join(version_dir, 'hash_keys.npy'), mmap_mode='r')
+        self.hash_rows = np.load(os.path.join(version_dir, 'hash_rows.npy'), mmap_mode='r')
+        self.version = version
+        return True
+
+    def _row(self, user_id):
+        mask = len(self.hash_rows) - 1
+        slot = _slot(user_id, self.hash_bits)
+        while True:
+            row = self.hash_rows[slot]
+            if row == -1:
+                return None
+            if self.hash_keys[slot] == user_id:
+                return int(row)
+            slot = (slot + 1) & mask
+
+    def get(self, user_id):
+        # [(movie_id, score), ...] best first, or None for an unknown user
+        if time.monotonic() >= self._next_check:
+            self.refresh()
+        if self.version is None:
+            return None
+        row = self._row(user_id)
+        if row is None:
+            return None
+        movies = self.movies[row]
+        valid = movies >= 0
+        return list(zip(self.catalog[movies[valid]].tolist(), self.scores[row][valid].astype(float).tolist()))
+
+    def __contains__(self, user_id):
+        return self.version is not None and self._row(user_id) is not None
+
+    def __len__(self):
+        return self.n_users if self.version is not None else 0
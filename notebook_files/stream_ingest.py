@@ -0,0 +1,538 @@
+import os
+import json
+import time
+import pickle
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+
+from trending import TrendingScores, STREAM_STATE_PATH as TRENDING_STATE_PATH
+from windows import find_raw_data_dir, window_file_name
+from model_host import load_scoring_model
+from id_codes import load_codes
+from rec_store import merge_store, DEFAULT_STORE_ROOT
+from atomic_publish import current_version
+
+# Local stand-in for the Kafka rating topic. Events are one per line, either JSON
+#   {"user_id": 1, "movie_id": 2, "rating": 4, "timestamp": "2025-03-17 09:50:00"}
+# or the raw stream format
+#   2025-03-17T09:50:00,1,GET /rate/2=4
+EVENT_COLUMNS = ['user_id', 'movie_id', 'rating', 'timestamp']
+# Snapshot of the interaction store; checkpoints append to INTERACTIONS_PATH + '.log'
+INTERACTIONS_PATH = 'models/interactions.pkl'
+# Events not yet rolled into raw_data/, saved with every checkpoint
+BUFFER_PATH = 'models/stream_buffer.parquet'
+
+# Column order and dtypes of the Kafka window dumps in raw_data/
+WINDOW_COLUMNS = ['timestamp', 'user_id', 'movie_id', 'rating']
+WINDOW_DTYPES = {'timestamp': 'datetime64[ns]', 'user_id': 'int64', 'movie_id': 'object', 'rating': 'int64'}
+
+
+def to_window_frame(events):
+    window = events[WINDOW_COLUMNS].copy()
+    window['rating'] = window['rating'].round()
+    window['movie_id'] = window['movie_id'].astype(str)
+    return window.astype(WINDOW_DTYPES)
+
+
+def parse_event(line):
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        if line.startswith('{'):
+            record = json.loads(line)
+            event = {column: record[column] for column in EVENT_COLUMNS}
+        else:
+            timestamp, user_id, request = line.split(',', 2)
+            if not request.startswith('GET /rate/'):
+                return None
+            movie_id, rating = request[len('GET /rate/'):].rsplit('=', 1)
+            event = {'user_id': user_id, 'movie_id': movie_id, 'rating': rating, 'timestamp': timestamp}
+        event['rating'] = float(event['rating'])
+        event['timestamp'] = pd.Timestamp(event['timestamp'])
+        # A null timestamp parses to NaT and a "nan" rating to NaN; neither can
+        # be written to a window, so reject them here
+        if pd.isna(event['timestamp']) or not np.isfinite(event['rating']):
+            raise ValueError('missing timestamp or rating')
+        if event['timestamp'].tzinfo is not None:
+            event['timestamp'] = event['timestamp'].tz_localize(None)
+    except (ValueError, TypeError, KeyError, json.JSONDecodeError):
+        # TypeError covers JSON nulls, e.g. "rating": null
+        print(f"Skipping malformed event: {line[:200]}")
+        return None
+    # Same id types as the Kafka dumps: integer user ids, string movie ids
+    try:
+        event['user_id'] = int(event['user_id'])
+    except (TypeError, ValueError):
+        print(f"Skipping event with non-integer user id: {line[:200]}")
+        return None
+    event['movie_id'] = str(event['movie_id'])
+    return event
+
+
+# ----- sources -----
+
+class FileTailSource:
+    # Follows a growing file like `tail -f`, starting from the end unless from_start is set
+
+    def __init__(self, path, from_start=False, poll_interval=0.2):
+        self.path = path
+        self.from_start = from_start
+        self.poll_interval = poll_interval
+
+    async def run(self, queue):
+        while not os.path.exists(self.path):
+            await asyncio.sleep(self.poll_interval)
+        with open(self.path, 'r') as f:
+            if not self.from_start:
+                f.seek(0, os.SEEK_END)
+            partial = ''
+            while True:
+                chunk = f.readline()
+                if not chunk:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                partial += chunk
+                if not partial.endswith('\n'):
+                    # Writer hasn't finished this line yet
+                    continue
+                event = parse_event(partial)
+                partial = ''
+                if event is not None:
+                    await queue.put(event)
+
+
+class SocketSource:
+    # Accepts any number of TCP producers that write newline-delimited events
+
+    def __init__(self, host='127.0.0.1', port=9092):
+        self.host = host
+        self.port = port
+
+    async def run(self, queue):
+        async def handle(reader, writer):
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    event = parse_event(line.decode('utf-8', errors='replace'))
+                    if event is not None:
+                        await queue.put(event)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle, self.host, self.port)
+        print(f"Listening for rating events on {self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+
+def source_from_spec(spec):
+    # 'file:<path>' or 'socket:<host>:<port>'
+    kind, _, target = spec.partition(':')
+    if kind == 'file':
+        return FileTailSource(target, from_start=os.environ.get('STREAM_FROM_START') == '1')
+    if kind == 'socket':
+        host, _, port = target.rpartition(':')
+        return SocketSource(host or '127.0.0.1', int(port))
+    raise ValueError(f"Unknown stream source '{spec}', expected file:<path> or socket:<host>:<port>")
+
+
+# ----- state updated by each micro-batch -----
+
+class InteractionStore:
+    # Latest rating per (user, movie), so a re-rating replaces the old value.
+    # A checkpoint appends only the ratings since the previous one to a log;
+    # the log is folded into the snapshot when the store is next loaded.
+
+    def __init__(self, path=INTERACTIONS_PATH):
+        self.path = path
+        self.ratings = {}
+        self.unsaved = []
+
+    def update(self, batch):
+        records = list(zip(batch['user_id'].tolist(), batch['movie_id'].tolist(), batch['rating'].tolist()))
+        for user_id, movie_id, rating in records:
+            self.ratings.setdefault(user_id, {})[movie_id] = rating
+        self.unsaved.extend(records)
+
+    def rated_movies(self, user_id):
+        return self.ratings.get(user_id, {})
+
+    def save(self):
+        if not self.unsaved:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + '.log', 'ab') as f:
+            pickle.dump(self.unsaved, f)
+            f.flush()
+            os.fsync(f.fileno())
+        self.unsaved = []
+
+    @classmethod
+    def load(cls, path=INTERACTIONS_PATH):
+        store = cls(path)
+        if os.path.exists(path):
+            store.ratings = joblib.load(path)
+        log_path = path + '.log'
+        if os.path.exists(log_path):
+            with open(log_path, 'rb') as f:
+                while True:
+                    try:
+                        records = pickle.load(f)
+                    except EOFError:
+                        break
+                    except (pickle.UnpicklingError, ValueError):
+                        print(f"Ignoring a partly written record at the end of {log_path}")
+                        break
+                    for user_id, movie_id, rating in records:
+                        store.ratings.setdefault(user_id, {})[movie_id] = rating
+            # Compact once per start; replaying the log again after a crash here is harmless
+            joblib.dump(store.ratings, path + '.tmp')
+            os.replace(path + '.tmp', path)
+            os.remove(log_path)
+        return store
+
+
+class ModelScorer:
+    # Scores every known movie for a user with the trained pipeline, the same way
+    # the batch recommendation step does. Takes and returns raw ids; the model
+    # itself works on the codes data prep assigned.
+
+    def __init__(self, model_path='models/movie_recommender.pkl', features_path='models/feature_list.pkl',
+                 data_path='data/X_train.csv'):
+        self.pipeline = load_scoring_model(model_path)
+        self.numerical_features = joblib.load(features_path)
+        train = pd.read_csv(data_path)
+        self.movie_ids = train['movie_id'].unique()
+        self.movie_codes = load_codes('movie')
+        self.user_codes = load_codes('user')
+        self.raw_movie_ids = None
+        if self.movie_codes is not None:
+            raw_by_code = {code: raw_id for raw_id, code in self.movie_codes.items()}
+            self.raw_movie_ids = np.array([raw_by_code.get(code) for code in self.movie_ids], dtype=object)
+        self.feature_defaults = {
+            feature: train[feature].median() if feature in train.columns else 0
+            for feature in self.numerical_features
+            if feature not in ['user_id', 'movie_id']
+        }
+
+    def __call__(self, user_id, exclude, n_recommendations):
+        # None when the user has no code yet (first seen after the last data prep)
+        if self.user_codes is not None:
+            user_id = self.user_codes.get(user_id)
+            if user_id is None:
+                return None
+        exclude = list(exclude)
+        if self.movie_codes is not None:
+            exclude = [self.movie_codes[movie_id] for movie_id in exclude if movie_id in self.movie_codes]
+        keep = ~np.isin(self.movie_ids, exclude) if exclude else np.ones(len(self.movie_ids), dtype=bool)
+        candidates = self.movie_ids[keep]
+
+        user_movies = pd.DataFrame({'user_id': user_id, 'movie_id': candidates})
+        for feature, value in self.feature_defaults.items():
+            user_movies[feature] = value
+        scores = self.pipeline.predict(user_movies[self.numerical_features])
+        top = np.argsort(scores)[::-1][:n_recommendations]
+        raw_ids = self.raw_movie_ids[keep] if self.raw_movie_ids is not None else candidates
+        return list(zip(raw_ids[top], scores[top]))
+
+    def store_rows(self, recommendations):
+        # {raw user id: [(raw movie id, score), ...]} as rows of the recommendation
+        # store, which like the batch output is keyed on data prep codes. Also
+        # returns the coded users, including any whose list is now empty.
+        rows, users = [], []
+        for user_id, recommended in recommendations.items():
+            user_code = self.user_codes.get(user_id) if self.user_codes is not None else user_id
+            if user_code is None:
+                continue
+            users.append(user_code)
+            for movie_id, score in recommended:
+                movie_code = self.movie_codes[movie_id] if self.movie_codes is not None else movie_id
+                rows.append((user_code, movie_code, float(score)))
+        return pd.DataFrame(rows, columns=['user_id', 'movie_id', 'predicted_rating']), users
+
+
+class RecommendationCache:
+    # Per-user top-N lists. Users touched by a batch have the movies they just
+    # rated removed right away and are queued for rescoring when a scorer is
+    # available; the scoring itself runs off the event loop (see StreamConsumer).
+    # Changed lists are marked dirty until the consumer publishes them to the
+    # recommendation store that readers look users up in.
+
+    def __init__(self, scorer=None, n_recommendations=5):
+        self.scorer = scorer
+        self.n_recommendations = n_recommendations
+        self.recommendations = {}
+        # Users waiting to be rescored, oldest first
+        self.pending = {}
+        # Users whose list changed since it was last published
+        self.dirty = set()
+
+    def update(self, batch, interactions):
+        touched = {}
+        for user_id, movie_id in zip(batch['user_id'], batch['movie_id']):
+            touched.setdefault(user_id, set()).add(movie_id)
+        for user_id, movie_ids in touched.items():
+            cached = self.recommendations.get(user_id)
+            if cached is not None:
+                self.recommendations[user_id] = [rec for rec in cached if rec[0] not in movie_ids]
+                self.dirty.add(user_id)
+            if self.scorer is not None:
+                self.pending[user_id] = None
+        return len(touched)
+
+    def take_pending(self, interactions, limit):
+        # Up to `limit` queued users with a snapshot of what they have rated,
+        # taken on the event loop so the scoring thread never reads live state
+        jobs = []
+        for user_id in list(self.pending)[:limit]:
+            del self.pending[user_id]
+            jobs.append((user_id, list(interactions.rated_movies(user_id))))
+        return jobs
+
+    def score(self, jobs):
+        # Runs in the scoring thread
+        return {user_id: self.scorer(user_id, rated, self.n_recommendations) for user_id, rated in jobs}
+
+    def apply(self, results, interactions):
+        # Movies rated while the job was running must not come back
+        for user_id, rescored in results.items():
+            if rescored is None:
+                continue
+            rated = interactions.rated_movies(user_id)
+            self.recommendations[user_id] = [rec for rec in rescored if rec[0] not in rated]
+            self.dirty.add(user_id)
+
+    def take_dirty(self, everyone=False):
+        # Snapshot of the lists to publish, taken on the event loop
+        users = list(self.recommendations) if everyone else list(self.dirty)
+        self.dirty = set()
+        return {user_id: list(self.recommendations[user_id]) for user_id in users}
+
+
+class WindowRoller:
+    # Buffers events and periodically writes them to raw_data/ in the same
+    # ratings_<start>_to_<end>.parquet format as the Kafka dumps
+
+    def __init__(self, raw_data_dir=None, roll_interval=3600.0, max_rows=100000, buffer_path=BUFFER_PATH):
+        self.raw_data_dir = raw_data_dir or find_raw_data_dir()
+        self.roll_interval = roll_interval
+        self.max_rows = max_rows
+        self.buffer_path = buffer_path
+        self.buffer = []
+        self.last_roll = time.monotonic()
+        # Events a previous run had counted but not yet rolled
+        if os.path.exists(buffer_path):
+            spilled = pd.read_parquet(buffer_path)
+            print(f"Restored {len(spilled)} buffered events from {buffer_path}")
+            self.buffer.append(spilled)
+
+    def add(self, batch):
+        self.buffer.append(batch)
+
+    def due(self):
+        if not self.buffer:
+            return False
+        buffered_rows = sum(len(batch) for batch in self.buffer)
+        return buffered_rows >= self.max_rows or time.monotonic() - self.last_roll >= self.roll_interval
+
+    def roll(self):
+        self.last_roll = time.monotonic()
+        if not self.buffer:
+            return None
+        window = to_window_frame(pd.concat(self.buffer, ignore_index=True)).sort_values('timestamp')
+        os.makedirs(self.raw_data_dir, exist_ok=True)
+        name = window_file_name(window['timestamp'].iloc[0], window['timestamp'].iloc[-1])
+        path = os.path.join(self.raw_data_dir, name)
+        # Write under a non-.parquet name first so readers globbing raw_data never see a partial file
+        window.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+        # The buffer is only cleared once the window is on disk, so a failed
+        # roll leaves the events to be spilled and retried
+        self.buffer = []
+        # Only now drop the spilled copy: a crash in between duplicates events rather than losing them
+        self.spill()
+        print(f"Rolled {len(window)} events into {name}")
+        return path
+
+    def spill(self):
+        # Persist the unrolled buffer so counters checkpointed after this never
+        # cover events that exist nowhere on disk
+        if not self.buffer:
+            if os.path.exists(self.buffer_path):
+                os.remove(self.buffer_path)
+            return
+        os.makedirs(os.path.dirname(self.buffer_path), exist_ok=True)
+        buffered = to_window_frame(pd.concat(self.buffer, ignore_index=True))
+        buffered.to_parquet(self.buffer_path + '.tmp', index=False)
+        os.replace(self.buffer_path + '.tmp', self.buffer_path)
+
+
+# ----- consumer -----
+
+class StreamConsumer:
+
+    def __init__(self, source, batch_size=500, max_batch_delay=1.0, scorer=None,
+                 roll_interval=3600.0, checkpoint_interval=60.0, max_rescore_per_job=50,
+                 publish_interval=2.0, store_root=DEFAULT_STORE_ROOT):
+        self.source = source
+        self.publish_interval = publish_interval
+        self.store_root = store_root
+        # Last store version this consumer published
+        self.published_version = None
+        self.max_rescore_per_job = max_rescore_per_job
+        # One scoring thread: rescoring never blocks ingestion, and a backlog of
+        # touched users waits in the cache's pending queue instead of piling up jobs
+        self.scoring_executor = ThreadPoolExecutor(max_workers=1)
+        self.rescore_needed = asyncio.Event()
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay
+        self.checkpoint_interval = checkpoint_interval
+        self.queue = asyncio.Queue(maxsize=batch_size * 20)
+        self.interactions = InteractionStore.load()
+        self.trending = TrendingScores.load(
+            TRENDING_STATE_PATH,
+            half_life_hours=float(os.environ.get('TRENDING_HALF_LIFE_HOURS', '24'))
+        )
+        self.cache = RecommendationCache(scorer)
+        self.roller = WindowRoller(roll_interval=roll_interval)
+        self.last_checkpoint = time.monotonic()
+
+    async def next_batch(self):
+        # Block for the first event, then take whatever arrives within max_batch_delay
+        events = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_batch_delay
+        while len(events) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                events.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return pd.DataFrame(events, columns=EVENT_COLUMNS)
+
+    def process(self, batch):
+        started = time.monotonic()
+        self.interactions.update(batch)
+        self.trending.update(batch['movie_id'].values, batch['timestamp'].values)
+        n_users = self.cache.update(batch, self.interactions)
+        if self.cache.pending:
+            self.rescore_needed.set()
+        self.roller.add(batch)
+        lag = (pd.Timestamp.now() - batch['timestamp'].min()).total_seconds()
+        print(f"Applied batch of {len(batch)} events for {n_users} users "
+              f"in {time.monotonic() - started:.3f}s (oldest event {lag:.1f}s old)")
+
+        if self.roller.due():
+            self.roll()
+            self.checkpoint()
+        elif time.monotonic() - self.last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+
+    def roll(self):
+        path = self.roller.roll()
+        if path is not None:
+            # Saved with the counters at the next checkpoint: the recommend step
+            # skips windows listed here, since these counters already include them
+            self.trending.processed_files.add(os.path.basename(path))
+
+    def checkpoint(self):
+        # Buffered events reach disk before any counters that include them
+        self.roller.spill()
+        self.interactions.save()
+        self.trending.save(TRENDING_STATE_PATH)
+        self.last_checkpoint = time.monotonic()
+
+    async def rescore_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.rescore_needed.wait()
+            jobs = self.cache.take_pending(self.interactions, self.max_rescore_per_job)
+            if not self.cache.pending:
+                self.rescore_needed.clear()
+            if not jobs:
+                continue
+            started = time.monotonic()
+            results = await loop.run_in_executor(self.scoring_executor, self.cache.score, jobs)
+            self.cache.apply(results, self.interactions)
+            print(f"Rescored {len(jobs)} users in {time.monotonic() - started:.2f}s "
+                  f"({len(self.cache.pending)} still queued)")
+
+    def publish(self, recommendations):
+        # Runs in the scoring thread, after any rescoring queued before it
+        rows, users = self.cache.scorer.store_rows(recommendations)
+        if not users:
+            return self.published_version
+        return merge_store(rows, users, self.store_root)
+
+    async def publish_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.publish_interval)
+            # A version this consumer didn't publish (the recommend step's) has
+            # none of its lists, so put all of them back on top
+            live = current_version(self.store_root)
+            overwritten = live is not None and live != self.published_version
+            if not self.cache.dirty and not (overwritten and self.cache.recommendations):
+                continue
+            recommendations = self.cache.take_dirty(everyone=overwritten)
+            started = time.monotonic()
+            self.published_version = await loop.run_in_executor(
+                self.scoring_executor, self.publish, recommendations
+            )
+            print(f"Published {len(recommendations)} users to store version {self.published_version} "
+                  f"in {time.monotonic() - started:.2f}s")
+
+    async def consume(self):
+        while True:
+            batch = await self.next_batch()
+            self.process(batch)
+
+    async def run(self):
+        tasks = {asyncio.create_task(self.source.run(self.queue), name='source'),
+                 asyncio.create_task(self.consume(), name='consumer')}
+        if self.cache.scorer is not None:
+            tasks.add(asyncio.create_task(self.rescore_worker(), name='rescore'))
+            tasks.add(asyncio.create_task(self.publish_worker(), name='publish'))
+        try:
+            # Every task runs forever, so the first one to finish has failed (a
+            # source that can't bind its port, a scoring error). Stop with its
+            # traceback rather than idling with ingestion dead.
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+                raise RuntimeError(f"Stream {task.get_name()} task stopped unexpectedly")
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.scoring_executor.shutdown(wait=False)
+            try:
+                self.roll()
+            finally:
+                self.checkpoint()
+
+
+if __name__ == '__main__':
+    source = source_from_spec(os.environ.get('STREAM_SOURCE', 'socket:127.0.0.1:9092'))
+    scorer = ModelScorer() if os.path.exists('models/movie_recommender.pkl') else None
+    if scorer is None:
+        print("No trained model found, recommendation cache will only drop newly rated movies")
+    consumer = StreamConsumer(
+        source,
+        batch_size=int(os.environ.get('STREAM_BATCH_SIZE', '500')),
+        max_batch_delay=float(os.environ.get('STREAM_MAX_BATCH_DELAY', '1.0')),
+        scorer=scorer,
+        roll_interval=float(os.environ.get('STREAM_ROLL_INTERVAL', '3600')),
+        max_rescore_per_job=int(os.environ.get('STREAM_MAX_RESCORE', '50')),
+        publish_interval=float(os.environ.get('STREAM_PUBLISH_INTERVAL', '2')),
+    )
+    try:
+        asyncio.run(consumer.run())
+    except KeyboardInterrupt:
+        print("Stream ingestion stopped")
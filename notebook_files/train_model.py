@@ -0,0 +1,78 @@
+import os
+
+from modeling import build_pipeline, load_tuned_config, select_features
+
+# pandas, joblib and the sklearn estimators are imported on the code paths that
+# need them so that importing this module stays cheap
+
+
+def train(X_train, y_train, numerical_features):
+    X_train_features = X_train[numerical_features]
+
+    # Search hyperparameters with successive halving before the full fit if requested
+    if os.environ.get('TUNE') == '1':
+        print("Tuning hyperparameters...")
+        import tune
+        tune.main()
+
+    # Create a pipeline with preprocessing and model, using the tuned config if there is one
+    config = load_tuned_config()
+    print(f"Training recommendation model with config: {config}")
+    pipeline = build_pipeline(config)
+
+    # Train the model
+    pipeline.fit(X_train_features, y_train.values.ravel())
+    return pipeline
+
+
+def build_item_neighbours():
+    from item_similarity import load_ratings, build_neighbours, save_neighbours, DEFAULT_NEIGHBOURS_PATH
+
+    # Build item-item neighbour lists for "movies like this one" recommendations
+    print("Building item-item similarity neighbours...")
+    movie_ids, indptr, indices, data = build_neighbours(
+        load_ratings(splits=('train',)),
+        k=int(os.environ.get('ITEM_NEIGHBOURS_K', '50')),
+        block_size=int(os.environ.get('ITEM_NEIGHBOURS_BLOCK_SIZE', '1000')),
+    )
+    save_neighbours(DEFAULT_NEIGHBOURS_PATH, movie_ids, indptr, indices, data)
+    print(f"Saved {len(indices)} neighbour pairs for {len(movie_ids)} movies")
+
+
+def main():
+    import pandas as pd
+    import joblib
+
+    print("Loading training data...")
+    X_train = pd.read_csv('data/X_train.csv')
+    y_train = pd.read_csv('data/y_train.csv')
+
+    print(f"Training data shape: {X_train.shape}")
+    print(f"Training data columns: {X_train.columns.tolist()}")
+
+    # Select numerical features for the model
+    numerical_features = select_features(X_train)
+    print(f"Using features: {numerical_features}")
+
+    pipeline = train(X_train, y_train, numerical_features)
+
+    # Save the model and the feature list
+    print("Saving model...")
+    os.makedirs('models', exist_ok=True)
+    joblib.dump(pipeline, 'models/movie_recommender.pkl')
+    joblib.dump(numerical_features, 'models/feature_list.pkl')
+
+    # Publish the fitted arrays for scoring workers to memory-map; workers that
+    # are already attached switch to this version on their next refresh. A sample
+    # of the training rows checks the export against the pipeline first.
+    from model_host import publish_pipeline, DEFAULT_HOST_ROOT
+    version = publish_pipeline(pipeline, numerical_features, X_train.head(1000))
+    print(f"Published shared model version {version} to {DEFAULT_HOST_ROOT}")
+
+    build_item_neighbours()
+
+    print("Model training completed successfully!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+import os
+import math
+import heapq
+import joblib
+import numpy as np
+import pandas as pd
+
+from windows import list_window_files
+
+DEFAULT_STATE_PATH = 'models/trending_state.pkl'
+# Counters kept by the stream consumer (stream_ingest.py) for the events it has
+# ingested. Windows it rolls are listed in its processed_files, so the batch
+# state skips them and the two states never count the same event.
+STREAM_STATE_PATH = 'models/trending_stream_state.pkl'
+DEFAULT_HALF_LIFE_HOURS = 24.0
+
+# Counters are stored relative to a reference time so that adding an event
+# never touches the other movies: an event at time t adds exp(rate * (t - ref)).
+# Once that exponent gets large we rebase every counter onto a newer reference,
+# which is the only O(movies) operation and happens rarely.
+MAX_EXPONENT = 50.0
+# Counters that have decayed below this are dropped on rebase
+MIN_SCORE = 1e-6
+
+
+class TrendingScores:
+    # Exponentially decayed per-movie event counters, updated window by window
+
+    def __init__(self, half_life_hours=DEFAULT_HALF_LIFE_HOURS):
+        self.half_life_hours = half_life_hours
+        self.decay_rate = math.log(2) / (half_life_hours * 3600.0)
+        self.reference_time = None
+        self.last_event_time = None
+        self.counters = {}
+        self.processed_files = set()
+
+    # ----- updates -----
+
+    def update(self, movie_ids, timestamps):
+        # Add one event per (movie_id, timestamp) pair; cost is O(len(movie_ids))
+        events = pd.DataFrame({
+            'movie_id': np.asarray(movie_ids),
+            'timestamp': pd.to_datetime(pd.Series(timestamps), errors='coerce').values,
+        }).dropna()
+        if len(events) == 0:
+            return 0
+
+        seconds = events['timestamp'].values.astype('datetime64[ns]').astype('int64') / 1e9
+        newest = float(seconds.max())
+        if self.reference_time is None:
+            self.reference_time = float(seconds.min())
+        if self.decay_rate * (newest - self.reference_time) > MAX_EXPONENT:
+            self._rebase(newest)
+
+        weights = np.exp(self.decay_rate * (seconds - self.reference_time))
+        per_movie = pd.Series(weights).groupby(events['movie_id'].values).sum()
+        counters = self.counters
+        for movie_id, weight in per_movie.items():
+            counters[movie_id] = counters.get(movie_id, 0.0) + float(weight)
+
+        if self.last_event_time is None or newest > self.last_event_time:
+            self.last_event_time = newest
+        return len(events)
+
+    def update_from_file(self, path):
+        # Windows are immutable once dumped, so the file name identifies them
+        name = os.path.basename(path)
+        if name in self.processed_files:
+            return 0
+        df = pd.read_parquet(path, columns=['movie_id', 'timestamp'])
+        n_events = self.update(df['movie_id'].values, df['timestamp'].values)
+        self.processed_files.add(name)
+        return n_events
+
+    def update_from_windows(self, raw_data_dir=None):
+        # Only windows not seen by a previous run are read
+        total = 0
+        for path in list_window_files(raw_data_dir):
+            n_events = self.update_from_file(path)
+            if n_events:
+                print(f"Trending: added {n_events} events from {os.path.basename(path)}")
+            total += n_events
+        return total
+
+    def _rebase(self, new_reference_time):
+        factor = math.exp(-self.decay_rate * (new_reference_time - self.reference_time))
+        self.counters = {
+            movie_id: value * factor
+            for movie_id, value in self.counters.items()
+            if value * factor >= MIN_SCORE
+        }
+        self.reference_time = new_reference_time
+
+    # ----- queries -----
+
+    def _decay_factor(self, now):
+        if now is None:
+            now = self.last_event_time
+        elif not isinstance(now, (int, float)):
+            now = pd.Timestamp(now).value / 1e9
+        return math.exp(-self.decay_rate * (now - self.reference_time))
+
+    def top_k(self, k=20, now=None):
+        # Decay is a common factor for all movies, so ranking only needs the stored counters
+        if not self.counters:
+            return []
+        factor = self._decay_factor(now)
+        best = heapq.nlargest(k, self.counters.items(), key=lambda item: item[1])
+        return [(movie_id, value * factor) for movie_id, value in best]
+
+    def scores(self, now=None):
+        if not self.counters:
+            return {}
+        factor = self._decay_factor(now)
+        return {movie_id: value * factor for movie_id, value in self.counters.items()}
+
+    # ----- checkpointing -----
+
+    def save(self, path=DEFAULT_STATE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        joblib.dump(self.__dict__, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_STATE_PATH, half_life_hours=DEFAULT_HALF_LIFE_HOURS):
+        trending = cls(half_life_hours)
+        if os.path.exists(path):
+            state = joblib.load(path)
+            if state.get('half_life_hours') == half_life_hours:
+                trending.__dict__.update(state)
+            else:
+                print("Trending half-life changed, rebuilding state from all windows")
+        return trending
+
+
+def combined_scores(states, now=None):
+    # Scores summed over states that count disjoint events, all decayed to the
+    # same time (by default the newest event any of them has seen)
+    if now is None:
+        times = [state.last_event_time for state in states if state.last_event_time is not None]
+        now = max(times) if times else None
+    combined = {}
+    for state in states:
+        for movie_id, score in state.scores(now).items():
+            combined[movie_id] = combined.get(movie_id, 0.0) + score
+    return combined
+
+
+if __name__ == '__main__':
+    half_life = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', DEFAULT_HALF_LIFE_HOURS))
+    trending = TrendingScores.load(half_life_hours=half_life)
+    n_new = trending.update_from_windows()
+    trending.save()
+    print(f"Processed {n_new} new events, tracking {len(trending.counters)} movies")
+    for movie_id, score in trending.top_k(10):
+        print(f"  {movie_id}: {score:.2f}")
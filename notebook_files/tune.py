@@ -0,0 +1,159 @@
+import os
+import json
+import math
+import time
+import random
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from modeling import DEFAULT_CONFIG, TUNING_CONFIG_PATH, build_pipeline, select_features
+
+TUNING_RESULTS_PATH = 'models/tuning_results.csv'
+SPLIT_CACHE_DIR = 'data/tuning_split'
+
+# Search space for random candidates. Engine settings (imputer, scaling) are
+# searched together with the model hyperparameters.
+SEARCH_SPACE = {
+    'random_forest': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [None, 10, 20, 40],
+        'min_samples_leaf': [1, 5, 20],
+        'max_features': [1.0, 0.5, 'sqrt'],
+    },
+    'ridge': {
+        'alpha': [0.1, 1.0, 10.0, 100.0],
+    },
+}
+ENGINE_SPACE = {
+    'imputer_strategy': ['median', 'mean'],
+    'scale': [True, False],
+}
+
+# Share of the cached training split held out to rank candidates; the test
+# split stays untouched for 03-evaluate-model.py
+VALIDATION_FRACTION = 0.2
+
+
+def load_cached_split(data_dir='data', cache_dir=SPLIT_CACHE_DIR):
+    # The CSV splits from data prep, converted once to .npy arrays that every
+    # worker memory-maps instead of re-parsing. Rebuilt when the CSVs are newer.
+    X_path = os.path.join(data_dir, 'X_train.csv')
+    y_path = os.path.join(data_dir, 'y_train.csv')
+    features_path = os.path.join(cache_dir, 'features.json')
+    source_mtime = max(os.path.getmtime(X_path), os.path.getmtime(y_path))
+    if not os.path.exists(features_path) or os.path.getmtime(features_path) < source_mtime:
+        X_train = pd.read_csv(X_path)
+        y_train = pd.read_csv(y_path)
+        features = select_features(X_train)
+        # Fixed shuffle so every subsample is a prefix and larger rungs extend smaller ones
+        order = np.random.RandomState(42).permutation(len(X_train))
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(os.path.join(cache_dir, 'X.npy'), X_train[features].values[order].astype(np.float64))
+        np.save(os.path.join(cache_dir, 'y.npy'), y_train.values.ravel()[order].astype(np.float64))
+        # Written last so a partial cache is never taken as fresh
+        with open(features_path, 'w') as f:
+            json.dump(features, f)
+    with open(features_path) as f:
+        features = json.load(f)
+    X = np.load(os.path.join(cache_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(cache_dir, 'y.npy'), mmap_mode='r')
+    return X, y, features
+
+
+def sample_candidates(n_candidates, seed=42):
+    rng = random.Random(seed)
+    candidates = [dict(DEFAULT_CONFIG)]
+    seen = {json.dumps(candidates[0], sort_keys=True)}
+    attempts = 0
+    while len(candidates) < n_candidates and attempts < n_candidates * 20:
+        attempts += 1
+        model = rng.choice(list(SEARCH_SPACE))
+        config = dict(DEFAULT_CONFIG, model=model)
+        for name, values in dict(SEARCH_SPACE[model], **ENGINE_SPACE).items():
+            config[name] = rng.choice(values)
+        key = json.dumps(config, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            candidates.append(config)
+    return candidates
+
+
+_worker_data = {}
+
+
+def _init_worker(cache_dir):
+    _worker_data['X'] = np.load(os.path.join(cache_dir, 'X.npy'), mmap_mode='r')
+    _worker_data['y'] = np.load(os.path.join(cache_dir, 'y.npy'), mmap_mode='r')
+
+
+def _evaluate(candidate_id, config, n_train):
+    X, y = _worker_data['X'], _worker_data['y']
+    n_validation = int(len(X) * VALIDATION_FRACTION)
+    X_fit, y_fit = X[n_validation:n_validation + n_train], y[n_validation:n_validation + n_train]
+    X_val, y_val = X[:n_validation], y[:n_validation]
+
+    started = time.perf_counter()
+    pipeline = build_pipeline(config, n_jobs=1)
+    pipeline.fit(X_fit, y_fit)
+    fit_seconds = time.perf_counter() - started
+    rmse = float(np.sqrt(np.mean((pipeline.predict(X_val) - y_val) ** 2)))
+    return candidate_id, rmse, fit_seconds
+
+
+def successive_halving(n_candidates=27, eta=3, min_fraction=None, max_workers=None,
+                       cache_dir=SPLIT_CACHE_DIR):
+    X, _, _ = load_cached_split(cache_dir=cache_dir)
+    n_available = len(X) - int(len(X) * VALIDATION_FRACTION)
+    candidates = sample_candidates(n_candidates)
+    n_rungs = max(1, int(math.log(len(candidates)) / math.log(eta) + 1e-9) + 1)
+    if min_fraction is None:
+        min_fraction = eta ** -(n_rungs - 1)
+
+    results = []
+    survivors = list(range(len(candidates)))
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(cache_dir,)) as pool:
+        for rung in range(n_rungs):
+            fraction = min(1.0, min_fraction * eta ** rung)
+            n_train = max(1, int(n_available * fraction))
+            print(f"Rung {rung}: {len(survivors)} candidates on {n_train} rows ({fraction:.1%})")
+            futures = [pool.submit(_evaluate, i, candidates[i], n_train) for i in survivors]
+            rung_scores = {}
+            for future in futures:
+                candidate_id, rmse, fit_seconds = future.result()
+                rung_scores[candidate_id] = rmse
+                results.append(dict(candidates[candidate_id], candidate_id=candidate_id, rung=rung,
+                                    fraction=fraction, n_train=n_train, rmse=rmse, fit_seconds=fit_seconds))
+            n_keep = max(1, len(survivors) // eta)
+            survivors = sorted(survivors, key=rung_scores.get)[:n_keep]
+            if fraction >= 1.0:
+                break
+
+    best_config = candidates[survivors[0]]
+    return best_config, pd.DataFrame(results)
+
+
+def main():
+    best_config, results = successive_halving(
+        n_candidates=int(os.environ.get('TUNE_CANDIDATES', '27')),
+        eta=int(os.environ.get('TUNE_ETA', '3')),
+        max_workers=int(os.environ['TUNE_WORKERS']) if 'TUNE_WORKERS' in os.environ else None,
+    )
+    os.makedirs('models', exist_ok=True)
+    with open(TUNING_CONFIG_PATH, 'w') as f:
+        json.dump(best_config, f, indent=2)
+    results.to_csv(TUNING_RESULTS_PATH, index=False)
+
+    print("\n===== TUNING COST / QUALITY =====")
+    print(results.sort_values(['rung', 'rmse'])[
+        ['candidate_id', 'rung', 'n_train', 'model', 'rmse', 'fit_seconds']
+    ].to_string(index=False))
+    print(f"Total fit time: {results['fit_seconds'].sum():.1f}s")
+    print(f"Chosen config: {best_config}")
+    print("="*50)
+    return best_config
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import os
+import glob
+from datetime import datetime
+
+# Raw rating windows are dumped from Kafka as
+#   ratings_<start>_to_<end>.parquet
+# with both bounds formatted as '%Y-%m-%d %H:%M:%S'
+WINDOW_PREFIX = 'ratings_'
+WINDOW_SEPARATOR = '_to_'
+WINDOW_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def find_raw_data_dir():
+    # Same lookup order as the data prep step: cwd, parent, then next to this file
+    if os.path.exists('raw_data'):
+        return 'raw_data'
+    if os.path.exists('../raw_data'):
+        return '../raw_data'
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, 'raw_data')
+
+
+def parse_window_bounds(path):
+    # Returns (start, end) datetimes, or None if the name does not follow the window format
+    name = os.path.basename(path)
+    if not name.startswith(WINDOW_PREFIX) or not name.endswith('.parquet'):
+        return None
+    bounds = name[len(WINDOW_PREFIX):-len('.parquet')].split(WINDOW_SEPARATOR)
+    if len(bounds) != 2:
+        return None
+    try:
+        start = datetime.strptime(bounds[0], WINDOW_TIME_FORMAT)
+        end = datetime.strptime(bounds[1], WINDOW_TIME_FORMAT)
+    except ValueError:
+        return None
+    return start, end
+
+
+def window_file_name(start, end):
+    return (f"{WINDOW_PREFIX}{start.strftime(WINDOW_TIME_FORMAT)}"
+            f"{WINDOW_SEPARATOR}{end.strftime(WINDOW_TIME_FORMAT)}.parquet")
+
+
+def list_window_files(raw_data_dir=None):
+    # All parquet windows ordered by their start time. Files that don't carry
+    # window bounds in their name sort first, in name order.
+    if raw_data_dir is None:
+        raw_data_dir = find_raw_data_dir()
+    files = glob.glob(os.path.join(raw_data_dir, '*.parquet'))
+
+    def sort_key(path):
+        bounds = parse_window_bounds(path)
+        if bounds is None:
+            return (0, datetime.min, os.path.basename(path))
+        return (1, bounds[0], os.path.basename(path))
+
+    return sorted(files, key=sort_key)
+
+
+def latest_window_end(raw_data_dir=None):
+    ends = [bounds[1] for bounds in map(parse_window_bounds, list_window_files(raw_data_dir)) if bounds]
+    return max(ends) if ends else None
+
+
+def select_window_files(start=None, end=None, raw_data_dir=None):
+    # Windows whose [start, end] bounds overlap the half-open range [start, end).
+    # Files without bounds in their name can't be pruned and are always kept.
+    selected = []
+    for path in list_window_files(raw_data_dir):
+        bounds = parse_window_bounds(path)
+        if bounds is not None:
+            if start is not None and bounds[1] < start:
+                continue
+            if end is not None and bounds[0] >= end:
+                continue
+        selected.append(path)
+    return selected
+
+
+def _window_filter(schema, start, end, users, movies):
+    # Arrow expression for the rows wanted from one window file, or None for all
+    # of them. Arrow prunes row groups on it using their min/max statistics and
+    # filters the rest while reading.
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    conditions = []
+    if (start is not None or end is not None) and 'timestamp' in schema.names:
+        timestamp_type = schema.field('timestamp').type
+        timestamp = pc.field('timestamp')
+        if not pa.types.is_timestamp(timestamp_type):
+            # Timestamps written as text can still be filtered, just not pruned
+            timestamp_type = pa.timestamp('ns')
+            timestamp = timestamp.cast(timestamp_type)
+        if start is not None:
+            conditions.append(timestamp >= pa.scalar(start.to_pydatetime(), type=timestamp_type))
+        if end is not None:
+            conditions.append(timestamp < pa.scalar(end.to_pydatetime(), type=timestamp_type))
+    for name, values in [('user_id', users), ('movie_id', movies)]:
+        if values is None or name not in schema.names:
+            continue
+        # Ids come in as ints or strings; match the column's type
+        id_type = schema.field(name).type
+        cast = int if pa.types.is_integer(id_type) else str
+        conditions.append(pc.field(name).isin(pa.array(sorted({cast(value) for value in values}), type=id_type)))
+    if not conditions:
+        return None
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression & condition
+    return expression
+
+
+def read_windows(start=None, end=None, users=None, movies=None, columns=None, raw_data_dir=None):
+    # Read the ratings in [start, end), optionally restricted to some users or movies.
+    # Whole files are pruned by the bounds in their names; within a file the
+    # filter is pushed down to Arrow, which skips row groups by their statistics.
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    frames = []
+    files = select_window_files(start, end, raw_data_dir)
+    for path in files:
+        schema = pq.read_schema(path)
+        read_columns = schema.names if columns is None else [c for c in schema.names if c in columns]
+        table = pq.read_table(path, columns=read_columns,
+                              filters=_window_filter(schema, start, end, users, movies))
+        if table.num_rows:
+            # Converted one by one: windows dumped at different times don't share
+            # an exact arrow schema, and pandas aligns the columns by name
+            frames.append(table.to_pandas())
+
+    print(f"Read {sum(len(frame) for frame in frames)} rows from {len(files)} window files")
+    if not frames:
+        return pd.DataFrame(columns=columns or [])
+    return pd.concat(frames, ignore_index=True)